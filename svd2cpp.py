@@ -1,48 +1,323 @@
 
-def convert(svd_file, ignore_cluster_regex):
-    import svd_cleanup
+# Files copied into the generate directory for distribution
+LICENSE_FILES = ['LICENSE', 'LICENSE.spdx']
+# Increment whenever the format of the cluster plan changes, see write_cluster_plan()
+CLUSTER_PLAN_FORMAT = 1
+# Manifest with the inputs of the last conversion into the generate directory, see generate_up_to_date()
+GENERATE_MANIFEST = '.svd2cpp_manifest.json'
+# Increment whenever the inputs or outputs in the manifest change
+GENERATE_MANIFEST_FORMAT = 2
+# Template rendered for each group, see generate()
+GROUP_TEMPLATE = '_device-group-regifc.hpp.jinja'
+# Template rendered for the groups shared by multiple devices, see generate_shared()
+SHARED_TEMPLATE = '_shared-regifc.hpp.jinja'
+# Set/reset alias registers (REGISTER:ALIAS:SET_SHIFT:RESET_SHIFT) detected by default, see parse_set_reset()
+DEFAULT_SET_RESET = 'ODR:BSRR:0:16'
+# Bit-band regions (BASE:SIZE:ALIAS) of the SRAM and peripherals of the Cortex-M3 and Cortex-M4, see parse_bit_band()
+CORTEX_M_BIT_BAND = '0x20000000:0x100000:0x22000000,0x40000000:0x100000:0x42000000'
+BIT_BAND_CPUS = ['CM3', 'CM4']
+# Size of the write buffer of the streamed templates, and of the blocks compared with the previous contents, see write_rendered()
+WRITE_BUFFER_SIZE = 1024 * 1024
 
-    print(f'Parsing SVD file: {svd_file}...')
-    device = svd_cleanup.parse_svd(svd_file)
+def convert(svd_file, ignore_cluster_regex, cluster_engine='search', svd_parser='cmsis_svd', cache_dir=None, cache_size=None, jobs=1, generate_dir=None, env=None, force=False, split_groups=False, dedup_groups=False, set_reset=DEFAULT_SET_RESET, bit_band='', profile_file=None, profile_top=10, cluster_plan_file=None, write_plan_file=None, check_plan_file=None):
+    """
+    Convert the SVD file into the generate directory, see build_model() and update_generated().
+    With a cluster plan file, the clusters of that plan are applied instead of searching for clusters. The clusters
+    found by this conversion are stored in the write plan file, and compared with those of the check plan file.
+    A cluster plan file and a check plan file cannot be combined, as applying a plan does not search for other clusters.
+    Returns the differences with the check plan file, see svd_cleanup.compare_cluster_plan()
+    """
+    import os
+    import time
 
-    # Group, clean and cluster registers
-    groups = svd_cleanup.group_peripherals(device)
-    svd_cleanup.simplify_registers(groups)
-    svd_cleanup.clean_registers(groups)
-    svd_cleanup.cluster_registers(groups, ignore_cluster_regex)
-    # Indicate that the device file has been modified
-    device['description'] = svd_cleanup.clean_description(device['description']) + f', cleaned and clustered by svd_cleanup with arguments "--ignore_cluster \'{ignore_cluster_regex}\'"'
-    interrupts = list_interrupts(device)
+    if cluster_plan_file and check_plan_file:
+        raise ValueError('A cluster plan cannot be checked while applying a cluster plan, which does not search for clusters')
+
+    # Skip the conversion if all inputs are equal to those of the previous conversion into the same directory
+    if generate_dir is None:
+        generate_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'generated')
+    arguments = {'ignore_cluster': ignore_cluster_regex, 'split_groups': split_groups, 'dedup_groups': dedup_groups, 'set_reset': set_reset, 'bit_band': bit_band}
+    if cluster_plan_file:
+        import svd_cache
+        arguments['cluster_plan'] = svd_cache.file_hash(cluster_plan_file)
+    inputs = generate_inputs(svd_file, arguments)
+    if not force and generate_up_to_date(generate_dir, inputs):
+        print(f'Generated files in {generate_dir} are up to date, skipping conversion')
+        return []
+
+    # Measure each stage and the hot paths of clustering
+    stage_times = {}
+    if profile_file:
+        import svd_cleanup
+        svd_cleanup.reset_profile_statistics()
+
+    device, groups, interrupts = build_model(svd_file, ignore_cluster_regex, cluster_engine, svd_parser, cache_dir, cache_size, jobs, dedup_groups, set_reset, bit_band, stage_times, cluster_plan_file)
+
+    if write_plan_file:
+        write_cluster_plan(write_plan_file, svd_file, ignore_cluster_regex, groups)
+    differences = []
+    if check_plan_file:
+        differences = check_cluster_plan(check_plan_file, groups)
 
     # TODO: update generate to accomodate for:
     # - Overlapping registers should be generated in a union
     # - Allow a subset of registers to be clustered, and generate the overlapping registers, e.g., if the first register in the cluster has an additional 'enable' bit
-    # - Check SVDAccessType and maybe improve the register interface based on that (e.g., read-only fields do not get the 'write()' function)
-    generate(device, groups, interrupts)
+    start = time.perf_counter()
+    if env is None:
+        env = create_environment(os.path.join(cache_dir, 'templates') if cache_dir else None)
+    update_generated(device, groups, interrupts, generate_dir, env, split_groups, inputs, jobs)
+    stage_times['generate'] = time.perf_counter() - start
+
+    if profile_file:
+        report_profile(profile_file, svd_file, stage_times, profile_top)
+    return differences
+
+def build_model(svd_file, ignore_cluster_regex, cluster_engine='search', svd_parser='cmsis_svd', cache_dir=None, cache_size=None, jobs=1, dedup_groups=False, set_reset=DEFAULT_SET_RESET, bit_band='', stage_times=None, cluster_plan_file=None):
+    """
+    Parse the SVD file, and group, clean and cluster its registers.
+    With a cluster plan file (see write_cluster_plan()), its clusters are applied instead of searching for clusters.
+    Registers with a set/reset alias (see parse_set_reset()) or in a bit-band region (see parse_bit_band()) get atomic
+    accessors.
+    The time of each stage that is not restored from the cache is stored in the stage_times dictionary, if provided.
+    Returns the device, its groups and its interrupts, ready to be generated
+    """
+    import time
+    import svd_cleanup
+    import svd_cache
+
+    if stage_times is None:
+        stage_times = {}
+
+    def timed(function):
+        def run_timed(model):
+            start = time.perf_counter()
+            function(model)
+            stage_times[function.__name__] = time.perf_counter() - start
+        return run_timed
+
+    def parse(model):
+        print(f'Parsing SVD file: {svd_file}...')
+        model['device'] = svd_cleanup.parse_svd(svd_file, svd_parser)
+
+    def group(model):
+        model['groups'] = svd_cleanup.group_peripherals(model['device'])
+
+    def clean(model):
+        svd_cleanup.simplify_registers(model['groups'], jobs)
+        svd_cleanup.clean_registers(model['groups'], jobs)
+
+    def cluster(model):
+        # Statistics are accumulated over all conversions in this process, only report those of this device
+        diff_stats = svd_cleanup.diff_statistics()
+        plan = read_cluster_plan(cluster_plan_file)['groups'] if cluster_plan_file else None
+        svd_cleanup.cluster_registers(model['groups'], ignore_cluster_regex, cluster_engine, jobs, plan)
+        diff_stats = {key: count - diff_stats[key] for key, count in svd_cleanup.diff_statistics().items()}
+        print(f'Compared register names and descriptions with {diff_stats['fast']} fast and {diff_stats['general']} general diffs ({diff_stats['hits']} memo hits, {diff_stats['misses']} misses)')
+
+    # Group, clean and cluster registers, each stage may be restored from the cache
+    stages = [
+        ('parsed', timed(parse), {'parser': svd_parser}),
+        ('grouped', timed(group), {}),
+        ('cleaned', timed(clean), {}),
+        ('clustered', timed(cluster), {'ignore_cluster': ignore_cluster_regex, 'cluster_engine': cluster_engine} | ({'cluster_plan': svd_cache.file_hash(cluster_plan_file)} if cluster_plan_file else {})),
+    ]
+    model = svd_cache.run_stages(svd_file, stages, cache_dir, cache_size or svd_cache.DEFAULT_CACHE_SIZE)
+    return finish_model(model['device'], model['groups'], ignore_cluster_regex, dedup_groups, set_reset, bit_band, stage_times)
+
+def finish_model(device, groups, ignore_cluster_regex, dedup_groups=False, set_reset=DEFAULT_SET_RESET, bit_band='', stage_times=None):
+    """
+    Complete the clustered device model (see build_model()): find the atomic accessors, deduplicate the groups and
+    list the interrupts.
+    Returns the device, its groups and its interrupts, ready to be generated
+    """
+    import time
+    import svd_cleanup
+
+    # Set and clear bits with a single write where the hardware supports it
+    svd_cleanup.find_set_reset_registers(groups, parse_set_reset(set_reset))
+    svd_cleanup.find_bit_band_registers(groups, parse_bit_band(bit_band, device))
+
+    # Use a single interface for groups with equal registers
+    if dedup_groups:
+        svd_cleanup.deduplicate_groups(groups)
+
+    # Indicate that the device file has been modified
+    device.description = svd_cleanup.clean_description(device.description) + f', cleaned and clustered by svd_cleanup with arguments "--ignore_cluster \'{ignore_cluster_regex}\'"'
+    start = time.perf_counter()
+    interrupts = list_interrupts(device)
+    if stage_times is not None:
+        stage_times['list_interrupts'] = time.perf_counter() - start
+    return device, groups, interrupts
+
+def update_generated(device, groups, interrupts, generate_dir, env, split_groups, inputs, jobs=1):
+    """
+    Generate all files (see generate()), remove files which are no longer generated, and store the manifest
+    """
+    generated_files = generate(device, groups, interrupts, generate_dir, env, split_groups, jobs)
+    remove_stale_files(generate_dir, generated_files)
+    write_generate_manifest(generate_dir, inputs, generated_files)
+
+def report_profile(profile_file, svd_file, stage_times, top=10):
+    """
+    Store the time of each stage, the counters of the hot paths and the time and counters of each group (see
+    svd_cleanup.profile_statistics()) as JSON report, and print a summary with the slowest groups to cluster
+    """
+    import json
+    import svd_cleanup
+
+    statistics = svd_cleanup.profile_statistics()
+    report = {
+        'svd_file': svd_file,
+        'stages': stage_times,
+        'total_time': sum(stage_times.values()),
+        'counters': statistics['counters'],
+        'groups': statistics['groups'],
+    }
+    with open(profile_file, 'w') as file:
+        json.dump(report, file, indent=4)
+
+    print()
+    print(f'Profile of {svd_file}, stored in {profile_file}')
+    for stage, duration in stage_times.items():
+        print(f'  {stage:<16} {duration * 1000:>10.1f}ms')
+    print(f'  {'total':<16} {report['total_time'] * 1000:>10.1f}ms')
+    print('Counters:')
+    for name, count in report['counters'].items():
+        print(f'  {name:<24} {count:>12}')
+    cluster_profiles = report['groups'].get('cluster_group', {})
+    slowest = sorted(cluster_profiles.items(), key=lambda x: x[1]['time'], reverse=True)[:top]
+    if slowest:
+        print(f'Slowest {len(slowest)} groups to cluster:')
+        print(f'  {'group':<16} {'time':>12} {'registers':>10} {'candidates':>12} {'repeats':>10} {'similar':>10} {'overlaps':>10} {'diffs':>8}')
+        for name, profile in slowest:
+            print(f'  {name:<16} {profile['time'] * 1000:>10.1f}ms {profile['registers']:>10} {profile['run_candidates']:>12} {profile['repeat_checks']:>10} {profile['similar_checks']:>10} {profile['overlap_calls']:>10} {profile['diff_main_calls']:>8}')
+
+def write_cluster_plan(path, svd_file, ignore_cluster_regex, groups):
+    """
+    Store the cluster plan of the clustered groups (see svd_cleanup.cluster_registers()) as JSON, which lists for each
+    group and each of its lists of registers the runs found, and whether these were accepted or rejected.
+    The plan can be reviewed, and applied by later conversions instead of searching for clusters (see build_model()),
+    where runs can be rejected by changing their status to 'rejected'.
+    """
+    import json
+    import os
+    plan = {
+        'format': CLUSTER_PLAN_FORMAT,
+        'svd_file': os.path.basename(svd_file),
+        'ignore_cluster': ignore_cluster_regex,
+        'groups': {name: group.cluster_plan or {} for name, group in groups.items()},
+    }
+    if write_file(path, json.dumps(plan, indent=4) + '\n'):
+        print(f'Stored cluster plan in {path}')
+    else:
+        print(f'Unchanged cluster plan {path}')
+
+def read_cluster_plan(path):
+    """
+    Read a cluster plan stored by write_cluster_plan()
+    """
+    import json
+    with open(path) as file:
+        plan = json.load(file)
+    if not isinstance(plan, dict) or plan.get('format') != CLUSTER_PLAN_FORMAT:
+        raise ValueError(f'Cluster plan {path} has format {plan.get('format') if isinstance(plan, dict) else None}, expected {CLUSTER_PLAN_FORMAT}')
+    return plan
+
+def check_cluster_plan(path, groups):
+    """
+    Compare the cluster plan with the clusters found in the groups, and print each difference, see
+    svd_cleanup.compare_cluster_plan()
+    Returns the differences
+    """
+    import svd_cleanup
+    differences = svd_cleanup.compare_cluster_plan(read_cluster_plan(path)['groups'], groups)
+    for difference in differences:
+        print(difference)
+    if differences:
+        print(f'Found {len(differences)} differences with cluster plan {path}')
+    else:
+        print(f'All clusters are equal to cluster plan {path}')
+    return differences
+
+def read_ignore_cluster_file(path):
+    """
+    Read the ignore cluster regex from a file with a regex on each line, combined as alternatives.
+    Empty lines and lines starting with '#' are skipped.
+    """
+    with open(path) as file:
+        lines = [line.strip() for line in file]
+    return '|'.join(line for line in lines if line and not line.startswith('#'))
+
+def parse_set_reset(set_reset):
+    """
+    Parse the comma separated set/reset alias registers 'REGISTER:ALIAS:SET_SHIFT:RESET_SHIFT' into a list of rules for
+    svd_cleanup.find_set_reset_registers(), e.g., 'ODR:BSRR:0:16' for the STM32 GPIO
+    """
+    rules = []
+    for rule in filter(None, set_reset.split(',')):
+        try:
+            name, alias_name, set_shift, reset_shift = rule.split(':')
+            rules.append((name, alias_name, int(set_shift, 0), int(reset_shift, 0)))
+        except ValueError:
+            raise ValueError(f'Invalid set/reset alias {rule!r}, expected REGISTER:ALIAS:SET_SHIFT:RESET_SHIFT') from None
+    return rules
+
+def parse_bit_band(bit_band, device):
+    """
+    Parse the comma separated bit-band regions 'BASE:SIZE:ALIAS' into a list of regions for
+    svd_cleanup.find_bit_band_registers(), where 'auto' selects the regions of the Cortex-M3 and Cortex-M4 if the CPU
+    of the device is one of these
+    """
+    if bit_band == 'auto':
+        bit_band = CORTEX_M_BIT_BAND if (device.cpu or {}).get('name') in BIT_BAND_CPUS else ''
+    regions = []
+    for region in filter(None, bit_band.split(',')):
+        try:
+            base, size, alias_base = (int(value, 0) for value in region.split(':'))
+            regions.append((base, size, alias_base))
+        except ValueError:
+            raise ValueError(f'Invalid bit-band region {region!r}, expected BASE:SIZE:ALIAS') from None
+    return regions
 
 def list_interrupts(device):
     # List all interrupts to be able to sort them
     interrupts = {}
-    for peripheral in device['peripherals']:
+    for peripheral in device.peripherals:
         if peripheral['interrupts']:
             for interrupt in peripheral['interrupts']:
                 interrupts[interrupt['value']] = {'name': interrupt['name'], 'value': interrupt['value'], 'description': ' '.join(list(filter(len, interrupt['description'].split())))}
     return interrupts
 
-def generate(device, groups, interrupts):
+def template_dir():
+    """
+    Directory with the jinja templates, see create_environment()
+    """
     import os
-    import jinja2
+    return os.path.join(os.path.abspath(os.path.dirname(__file__)), 'template')
 
-    template_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'template')
+def create_environment(bytecode_cache_dir=None):
+    """
+    Create the jinja environment for all templates, which can be reused to generate multiple devices.
+    With a bytecode cache directory, the compiled templates are stored there and only compiled again once they change.
+    """
+    import hashlib
+    import os
+    import jinja2
+    import svd_model
 
     env = jinja2.Environment(
-        loader = jinja2.FileSystemLoader(template_dir),
+        loader = jinja2.FileSystemLoader(template_dir()),
         autoescape = jinja2.select_autoescape(),
         trim_blocks = True,
         lstrip_blocks = True,
         keep_trailing_newline=True,
         undefined=jinja2.StrictUndefined
     )
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        # The compiled templates depend on the whitespace options, which are not part of the key of the bytecode cache
+        options = f'{env.trim_blocks} {env.lstrip_blocks} {env.keep_trailing_newline}'
+        env.bytecode_cache = jinja2.FileSystemBytecodeCache(bytecode_cache_dir, f'{hashlib.sha256(options.encode()).hexdigest()[:16]}_%s.cache')
 
     def cvar(var_name):
         import re
@@ -52,43 +327,398 @@ def generate(device, groups, interrupts):
         return var_name
     env.filters["cvar"] = cvar
 
+    def field_access(field, register):
+        """
+        Access of a field in the generated interface: 'read-only', 'write-only', 'read-write' or 'one-to-clear' (write
+        one to clear), the access and modified write values of the register apply to fields without their own. The own
+        access of a field overrides the modified write values of the register, e.g., for a read-only status bit in a
+        register of write one to clear flags. The parsers propagate the access of the register to its fields, so a field
+        with the access of the register has no access of its own.
+        """
+        if field.access == 'read-only':
+            return 'read-only'
+        if field.modified_write_values == 'oneToClear' or (field.modified_write_values is None and field.access in [None, register.access] and register.modified_write_values == 'oneToClear'):
+            return 'one-to-clear'
+        access = field.access or register.access
+        return {'writeOnce': 'write-only', 'read-writeOnce': 'read-write', None: 'read-write'}.get(access, access)
+    env.filters["field_access"] = field_access
+
+    def register_access(register):
+        """
+        Access of a register in the generated interface: 'read-only', 'write-only', 'read-write' or 'read-action' (read
+        and write, but reading has side effects, so no implicit read-modify-write)
+        Registers without an access type are read-only or write-only if all of their fields are
+        """
+        field_accesses = {field_access(field, register) for field in register.fields}
+        access = {'writeOnce': 'write-only', 'read-writeOnce': 'read-write'}.get(register.access, register.access)
+        if access is None and len(field_accesses) == 1 and field_accesses & {'read-only', 'write-only'}:
+            access = field_accesses.pop()
+        if access in ['read-only', 'write-only']:
+            return access
+        if register.read_action or any(field.read_action for field in register.fields):
+            return 'read-action'
+        return 'read-write'
+    env.filters["register_access"] = register_access
+
+    def preserve_mask(register):
+        """
+        Mask of the register bits that must be written back when clearing a write one to clear field, which are the
+        readable fields that are changed by writing a zero, but not by writing back their current value
+        """
+        mask = 0
+        for field in register.fields:
+            if field_access(field, register) == 'read-write' and (field.modified_write_values or register.modified_write_values) not in ['oneToSet', 'oneToToggle', 'clear', 'set']:
+                mask |= ((1 << field.bit_width) - 1) << field.bit_offset
+        return mask
+    env.filters["preserve_mask"] = preserve_mask
+
+    def one_to_clear_mask(register):
+        """
+        Mask of the write one to clear fields of the register, which must be written back as zero by any read-modify-write
+        of the other fields, as writing back a set field would clear it
+        """
+        mask = 0
+        for field in register.fields:
+            if field_access(field, register) == 'one-to-clear':
+                mask |= ((1 << field.bit_width) - 1) << field.bit_offset
+        return mask
+    env.filters["one_to_clear_mask"] = one_to_clear_mask
+
+    def cluster(register):
+        """
+        Whether the item in a list of registers is a cluster of registers
+        """
+        return isinstance(register, svd_model.Cluster)
+    env.tests["cluster"] = cluster
+    return env
+
+def generate(device, groups, interrupts, generate_dir=None, env=None, split_groups=False, jobs=1):
+    """
+    Render all templates into the generate directory, only files with changed contents are written (see write_rendered()).
+    Templates starting with '_' are only used by other templates, or rendered separately:
+     * _device-group-regifc.hpp.jinja: with split_groups, the interface of each group is rendered into a separate header,
+       and device-regifc.hpp only includes all group headers
+     * _shared-regifc.hpp.jinja: the interfaces shared by multiple devices, see generate_shared()
+    With more than one job, the templates are rendered concurrently in a pool of worker processes (all processors if
+    jobs is 0 or None), see render_jobs().
+    Returns the paths of all generated files.
+    """
+    import os
+
+    if env is None:
+        env = create_environment()
+
     parameters = {
         'device': device,
         'groups': groups,
         'interrupts': sorted(interrupts.values(), key=lambda x: x['value']),
+        'split_groups': split_groups,
+        # Headers with the interfaces shared with other devices, see generate_shared()
+        'shared_headers': list(dict.fromkeys(group.shared_header for group in groups.values() if group.shared_header)),
     }
 
     # Make sure output directory exists
-    generate_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'generated')
+    if generate_dir is None:
+        generate_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'generated')
     if not os.path.exists(generate_dir):
         print(f'Creating directory {generate_dir}')
         os.makedirs(generate_dir)
 
     # Copy in license files for distribution
-    import shutil
-    for license_file in ['LICENSE', 'LICENSE.spdx']:
-        shutil.copyfile(license_file, os.path.join(generate_dir, license_file))
+    generated_files = []
+    for license_file in LICENSE_FILES:
+        generated_file = os.path.join(generate_dir, license_file)
+        with open(license_file, 'rb') as file:
+            write_file(generated_file, file.read())
+        generated_files.append(generated_file)
+
+    # Template files, and with split_groups a header for each group, as (template, generated file, group name)
+    renders = [(template_file, os.path.join(generate_dir, template_file.removesuffix('.jinja').replace('device', device.name.lower())), None)
+               for template_file in env.list_templates() if not template_file.startswith('_')]
+    if split_groups:
+        renders += [(GROUP_TEMPLATE, os.path.join(generate_dir, f'{device.name.lower()}-{group.name.lower()}-regifc.hpp'), name)
+                    for name, group in groups.items()]
+
+    for (_, generated_file, _), written in zip(renders, render_jobs(env, parameters, renders, jobs)):
+        if written:
+            print(f'Generated {generated_file}')
+        else:
+            print(f'Unchanged {generated_file}')
+        generated_files.append(generated_file)
+    return generated_files
+
+def render_jobs(env, parameters, renders, jobs=1):
+    """
+    Render each (template, generated file, group name) into the generated file, with the parameters and the group
+    of that name (if any) as 'group', see render_file().
+    With more than one job, the files are rendered concurrently in a pool of worker processes (all processors if jobs is
+    0 or None), each with its own environment (using the bytecode cache of env) and a copy of the parameters.
+    Returns whether each file was written, in the order of renders.
+    """
+    import os
+
+    jobs = jobs or os.cpu_count()
+    if jobs == 1 or len(renders) < 2:
+        return [render_file(env, parameters, *render) for render in renders]
+
+    from concurrent.futures import ProcessPoolExecutor
+    bytecode_cache_dir = getattr(env.bytecode_cache, 'directory', None)
+    with ProcessPoolExecutor(min(jobs, len(renders)), initializer=init_render_worker, initargs=(bytecode_cache_dir, parameters)) as executor:
+        futures = [executor.submit(run_render_job, *render) for render in renders]
+        return [future.result() for future in futures]
+
+# Jinja environment and template parameters of a render worker process, see init_render_worker()
+_render_env = None
+_render_parameters = None
+
+def init_render_worker(bytecode_cache_dir, parameters):
+    """
+    Create the jinja environment and store the template parameters once for each render worker process, see render_jobs()
+    """
+    global _render_env, _render_parameters
+    _render_env = create_environment(bytecode_cache_dir)
+    _render_parameters = parameters
+
+def run_render_job(template_file, generated_file, group_name):
+    """
+    Render a single file in a render worker process, see render_jobs()
+    """
+    return render_file(_render_env, _render_parameters, template_file, generated_file, group_name)
+
+def render_file(env, parameters, template_file, generated_file, group_name=None):
+    """
+    Stream the rendered template into the generated file, with the group of that name (if any) as 'group'.
+    Returns whether the file was written, see write_rendered()
+    """
+    if group_name is not None:
+        parameters = parameters | {'group': parameters['groups'][group_name]}
+    return write_rendered(generated_file, env.get_template(template_file).generate(parameters))
 
-    # Generate template files
-    for template_file in os.listdir(template_dir):
-        generated_file = os.path.join(generate_dir, os.path.basename(template_file.removesuffix('.jinja').replace('device', device['name'].lower())))
-        print(f'Generating {generated_file}...')
-        rendered = env.get_template(os.path.basename(template_file)).render(parameters)
-        with open(generated_file, 'w') as file:
-            file.write(rendered)
+def generate_shared(devices, groups, shared_name, generate_dir, env=None, inputs=None, force=False):
+    """
+    Render the interfaces of the groups shared by multiple devices (see svd_cleanup.find_shared_groups()) into a single
+    header in the generate directory. The device headers include this header instead of defining these interfaces,
+    for which each shared group should have 'shared_header' with the path of this header relative to the
+    device header.
+    With inputs (e.g., those of all devices, see generate_inputs()), these are stored in the manifest of the generate
+    directory, and the header is not rendered again if the inputs are unchanged (see generate_up_to_date()), unless
+    forced.
+    Returns the path of the shared header.
+    """
+    import os
+
+    generated_file = os.path.join(generate_dir, f'{shared_name}-regifc.hpp')
+    if inputs is not None and not force and generate_up_to_date(generate_dir, inputs):
+        print(f'Shared header {generated_file} is up to date, skipping generation')
+        return generated_file
+    if env is None:
+        env = create_environment()
+    os.makedirs(generate_dir, exist_ok=True)
+    if render_file(env, {'devices': devices, 'groups': groups, 'shared_name': shared_name}, SHARED_TEMPLATE, generated_file):
+        print(f'Generated {generated_file}')
+    else:
+        print(f'Unchanged {generated_file}')
+    if inputs is not None:
+        write_generate_manifest(generate_dir, inputs, [generated_file])
+    return generated_file
+
+def write_file(path, contents):
+    """
+    Write the contents (str or bytes) to the file, unless the file already has these contents, such that the
+    modification time of unchanged files is kept and dependent sources are not rebuilt.
+    The file is written atomically, by writing to a temporary file which then replaces the file.
+    Returns whether the file was written.
+    """
+    import os
+    mode = 'b' if isinstance(contents, bytes) else ''
+    try:
+        with open(path, f'r{mode}') as file:
+            if file.read() == contents:
+                return False
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, f'w{mode}') as file:
+        file.write(contents)
+    os.replace(temp_path, path)
+    return True
+
+def write_rendered(path, chunks):
+    """
+    Write the chunks (str) of a streamed template to the file, unless the file already has these contents (see
+    write_file()), without holding all contents in memory.
+    The chunks are written to a temporary file with a large write buffer, which is then compared in blocks with the
+    file, and either replaces the file or is removed.
+    Returns whether the file was written.
+    """
+    import os
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temp_path, 'w', buffering=WRITE_BUFFER_SIZE) as file:
+            file.writelines(chunks)
+        if same_contents(path, temp_path):
+            os.remove(temp_path)
+            return False
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+    return True
+
+def same_contents(path, other_path):
+    """
+    Whether both files exist and have equal contents, compared in blocks of WRITE_BUFFER_SIZE
+    """
+    import os
+    try:
+        if os.path.getsize(path) != os.path.getsize(other_path):
+            return False
+        with open(path, 'rb') as file, open(other_path, 'rb') as other_file:
+            while block := file.read(WRITE_BUFFER_SIZE):
+                if block != other_file.read(WRITE_BUFFER_SIZE):
+                    return False
+        return True
+    except FileNotFoundError:
+        return False
+
+def generate_inputs(svd_file, arguments):
+    """
+    Collect the hashes of all inputs of the conversion: the SVD file, the code, the templates, the license files and
+    the (dictionary of) arguments that change the generated files.
+    The template files are hashed directly, such that a skipped conversion does not need to import jinja.
+    """
+    import os
+    import svd_cache
+    return {
+        'format': GENERATE_MANIFEST_FORMAT,
+        'svd_file': svd_cache.file_hash(svd_file),
+        # The code building the device model includes svd2cpp itself, see svd_cache.MODEL_SOURCES
+        'code': svd_cache.model_version(),
+        'templates': {template_file: svd_cache.file_hash(os.path.join(template_dir(), template_file)) for template_file in sorted(os.listdir(template_dir()))},
+        'licenses': {license_file: svd_cache.file_hash(license_file) for license_file in LICENSE_FILES},
+        'arguments': arguments,
+    }
+
+def generate_up_to_date(generate_dir, inputs):
+    """
+    Check whether the manifest in the generate directory (see write_generate_manifest()) has equal inputs, and none of
+    the generated files have been modified or removed since.
+    Only the generated files of which the size or modification time changed are hashed again.
+    """
+    import json
+    import os
+    try:
+        with open(os.path.join(generate_dir, GENERATE_MANIFEST), 'r') as file:
+            manifest = json.load(file)
+        return manifest['inputs'] == inputs and all(output_state(os.path.join(generate_dir, name), state)['hash'] == state['hash'] for name, state in manifest['outputs'].items())
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+
+def output_state(path, previous_state=None):
+    """
+    State of a generated file in the manifest: its hash, size and modification time. The hash of the previous state is
+    reused if the size and modification time are equal.
+    """
+    import os
+    import svd_cache
+    stat = os.stat(path)
+    state = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if previous_state and all(previous_state.get(key) == value for key, value in state.items()):
+        return previous_state
+    return {'hash': svd_cache.file_hash(path)} | state
+
+def remove_stale_files(generate_dir, generated_files):
+    """
+    Remove the files listed in the manifest of the previous conversion (see write_generate_manifest()) which are no
+    longer generated, e.g., the group headers when split_groups is disabled
+    """
+    import json
+    import os
+    try:
+        with open(os.path.join(generate_dir, GENERATE_MANIFEST), 'r') as file:
+            previous_files = json.load(file)['outputs']
+    except (OSError, ValueError, KeyError, TypeError):
+        return
+    generated_names = {os.path.basename(generated_file) for generated_file in generated_files}
+    for name in previous_files:
+        if name not in generated_names and os.path.exists(os.path.join(generate_dir, name)):
+            print(f'Removing {os.path.join(generate_dir, name)}')
+            os.remove(os.path.join(generate_dir, name))
+
+def write_generate_manifest(generate_dir, inputs, generated_files):
+    """
+    Store the inputs and the state (see output_state()) of the generated files in the generate directory, see
+    generate_up_to_date()
+    """
+    import json
+    import os
+    manifest = {
+        'inputs': inputs,
+        'outputs': {os.path.basename(generated_file): output_state(generated_file) for generated_file in generated_files},
+    }
+    write_file(os.path.join(generate_dir, GENERATE_MANIFEST), json.dumps(manifest, indent=4) + '\n')
 
 
 if __name__ == "__main__":
     import argparse
+    import sys
+    # Required for the worker processes of '--jobs' in the binary distribution, only imported there to start faster
+    if getattr(sys, 'frozen', False):
+        import multiprocessing
+        multiprocessing.freeze_support()
     
     parser = argparse.ArgumentParser(prog='svd2cpp', description='Convert CMSIS SVD to modern C++ interfaces')
     parser.add_argument('svd_file', type=str, help='Path to the SVD file to convert')
     parser.add_argument('--ignore_cluster', type=str, help='Regex indicating which clusters to ignore, passed to svd_cleanup', default='')
+    parser.add_argument('--ignore_cluster_file', type=str, help='File with a regex on each line indicating which clusters to ignore, instead of --ignore_cluster', default=None)
+    parser.add_argument('--output_dir', type=str, help='Directory in which the files are generated', default=None)
+    parser.add_argument('--cluster_engine', type=str, help='Engine used to find repeating registers, passed to svd_cleanup (both result in equal clusters)', choices=['search', 'signature'], default='search')
+    parser.add_argument('--parser', type=str, help='Parser used to read the SVD file, passed to svd_cleanup (both result in equal output)', choices=['cmsis_svd', 'stream'], default='cmsis_svd')
+    parser.add_argument('--cache_dir', type=str, help='Directory in which the device model is cached after each stage', default=None)
+    parser.add_argument('--cache_size', type=int, help='Maximum size of the cache directory in MiB (default 256)', default=None)
+    parser.add_argument('--no_cache', action='store_true', help='Do not read or write the device model cache')
+    parser.add_argument('--split_groups', action='store_true', help='Generate a header for each peripheral group, included by the device header')
+    parser.add_argument('--dedup_groups', action='store_true', help='Generate a single interface for groups with equal registers, other groups use an alias')
+    parser.add_argument('--set_reset', type=str, help=f'Comma separated set/reset alias registers REGISTER:ALIAS:SET_SHIFT:RESET_SHIFT, of which bits are set and cleared with a single write, empty to disable (default {DEFAULT_SET_RESET})', default=DEFAULT_SET_RESET)
+    parser.add_argument('--bit_band', type=str, help='Comma separated bit-band regions BASE:SIZE:ALIAS, of which single bits are set and cleared with a single write, or auto for the regions of the Cortex-M3 and Cortex-M4', default='')
+    parser.add_argument('--cluster_plan', type=str, help='Apply the clusters of a cluster plan stored with --write_cluster_plan, instead of searching for clusters', default=None)
+    parser.add_argument('--write_cluster_plan', type=str, help='Store the clusters found as a reviewable JSON cluster plan', default=None)
+    parser.add_argument('--check_cluster_plan', type=str, help='Report the differences between the clusters found and a cluster plan, which fails the conversion if there are any', default=None)
+    parser.add_argument('--force', action='store_true', help='Convert the SVD file even if all inputs are equal to those of the previous conversion')
+    parser.add_argument('--profile', type=str, nargs='?', help='Store a JSON report with the time of each stage and group, and the counters of the hot paths (default svd2cpp_profile.json), which disables the cache', const='svd2cpp_profile.json', default=None)
+    parser.add_argument('--profile_top', type=int, help='Amount of slowest groups to summarize with --profile', default=10)
+    parser.add_argument('--watch', action='store_true', help='Keep the device model in memory, and regenerate whenever the SVD file, the templates or the ignore cluster file change (always converting, as with --force)')
+    parser.add_argument('--jobs', type=int, help='Amount of processes used to clean and cluster the register groups and render the templates, 0 to use all processors (all result in equal output)', default=1)
     args = parser.parse_args()
+    if args.cluster_plan and args.check_cluster_plan:
+        parser.error('--check_cluster_plan searches for clusters, which --cluster_plan does not, use only one of them')
+    if args.watch:
+        # Watch mode keeps the model in memory instead of the cache, and does not apply, store, check or profile clusters
+        options = {'--cluster_plan': args.cluster_plan, '--write_cluster_plan': args.write_cluster_plan, '--check_cluster_plan': args.check_cluster_plan, '--profile': args.profile, '--cache_size': args.cache_size}
+        if unsupported := [option for option, value in options.items() if value is not None]:
+            parser.error(f'{', '.join(unsupported)} cannot be combined with --watch')
 
     print('Converting SVD file:', args.svd_file)
 
-    convert(args.svd_file, args.ignore_cluster)
+    import svd_cache
+    cache_dir = None if args.no_cache else (args.cache_dir or svd_cache.DEFAULT_CACHE_DIR)
+    if args.profile:
+        # Profile all stages, instead of restoring them from the cache or skipping the conversion
+        cache_dir = None
+        args.force = True
+    if args.write_cluster_plan or args.check_cluster_plan:
+        # The clusters are only known after a conversion
+        args.force = True
+    if args.ignore_cluster_file:
+        args.ignore_cluster = read_ignore_cluster_file(args.ignore_cluster_file)
+    if args.watch:
+        import svd_watch
+        svd_watch.watch(args.svd_file, args.ignore_cluster, args.output_dir, args.ignore_cluster_file, cache_dir, svd_parser=args.parser, cluster_engine=args.cluster_engine, jobs=args.jobs, split_groups=args.split_groups, dedup_groups=args.dedup_groups, set_reset=args.set_reset, bit_band=args.bit_band)
+    else:
+        differences = convert(args.svd_file, args.ignore_cluster, args.cluster_engine, args.parser, cache_dir, args.cache_size * 1024 * 1024 if args.cache_size else None, args.jobs, args.output_dir, force=args.force, split_groups=args.split_groups, dedup_groups=args.dedup_groups, set_reset=args.set_reset, bit_band=args.bit_band, profile_file=args.profile, profile_top=args.profile_top, cluster_plan_file=args.cluster_plan, write_plan_file=args.write_cluster_plan, check_plan_file=args.check_cluster_plan)
+        if differences:
+            sys.exit(1)
 
     print()
     print('All done!')
@@ -0,0 +1,281 @@
+"""
+Convert multiple SVD files in a single invocation, see svd2cpp.convert().
+The devices are converted in parallel worker processes, where each worker creates the jinja environment once and reuses
+the compiled templates for every device it converts. Each device is generated in its own output directory, named after
+the SVD file, and the log of each device is printed in the order of the devices, followed by a timing summary.
+
+The devices are either given as (glob patterns of) SVD files, which are all converted using the '--ignore_cluster'
+argument, or listed in a JSON manifest, with per device options:
+[
+    {"svd_file": "svd/STM32H745_CM4.svd", "ignore_cluster": "(ADC.SQR|AXI.*)"},
+    {"svd_file": "svd/STM32L552.svd", "output_dir": "stm32l5"}
+]
+Relative paths in the manifest are relative to the manifest file.
+"""
+import contextlib
+import glob
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Jinja environment of this (worker) process, see init_worker()
+_env = None
+
+
+def read_manifest(manifest_file):
+    """
+    Read the list of device dictionaries from a JSON manifest, with the keys 'svd_file' and optionally 'ignore_cluster'
+    and 'output_dir'
+    """
+    with open(manifest_file) as file:
+        devices = json.load(file)
+    if not isinstance(devices, list):
+        raise ValueError(f'Manifest {manifest_file} should contain a list of devices')
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_file))
+    for device in devices:
+        if 'svd_file' not in device:
+            raise ValueError(f'Manifest {manifest_file} contains a device without svd_file: {device}')
+        unknown_keys = set(device) - {'svd_file', 'ignore_cluster', 'output_dir'}
+        if unknown_keys:
+            raise ValueError(f'Manifest {manifest_file} contains unknown keys {sorted(unknown_keys)} for device {device['svd_file']}')
+        device['svd_file'] = os.path.join(manifest_dir, device['svd_file'])
+    return devices
+
+def find_devices(patterns, ignore_cluster_regex=''):
+    """
+    List a device dictionary for each SVD file matching the (glob) patterns, in order of the patterns
+    """
+    devices = []
+    for pattern in patterns:
+        svd_files = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not svd_files:
+            raise ValueError(f'No SVD files match {pattern}')
+        devices += [{'svd_file': svd_file, 'ignore_cluster': ignore_cluster_regex} for svd_file in svd_files]
+    return devices
+
+def init_worker(bytecode_cache_dir=None):
+    """
+    Create the jinja environment once for each worker process, and compile (or load from the bytecode cache) all
+    templates up front
+    """
+    import svd2cpp
+    global _env
+    _env = svd2cpp.create_environment(bytecode_cache_dir)
+    for template_file in _env.list_templates():
+        _env.get_template(template_file)
+
+def device_dir(device, output_dir):
+    """
+    Directory in which the files of the device are generated
+    """
+    return os.path.join(output_dir, device.get('output_dir') or os.path.splitext(os.path.basename(device['svd_file']))[0])
+
+def run_device_task(function, device, *arguments):
+    """
+    Call function(device, *arguments) with the environment of this worker (see init_worker()).
+    Returns the log and duration of the task, the error if the task failed (None otherwise) and the result
+    """
+    log = io.StringIO()
+    error = None
+    result = None
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        try:
+            result = function(device, *arguments)
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            print(f'Failed to convert {device['svd_file']}: {error}')
+    return log.getvalue(), time.perf_counter() - start, error, result
+
+def map_devices(executor, function, tasks):
+    """
+    Run function(device, *arguments) for each (device, *arguments) tuple in tasks, in the executor if available,
+    otherwise in this process.
+    The log of each device is printed in order of the tasks, as soon as the task and all tasks before it are done.
+    Returns a list with the duration, error and result of each task
+    """
+    if executor is None:
+        tasks = (run_device_task(function, *task) for task in tasks)
+    else:
+        futures = [executor.submit(run_device_task, function, *task) for task in tasks]
+        tasks = (future.result() for future in futures)
+    results = []
+    for log, duration, error, result in tasks:
+        print(log, end='')
+        results.append((duration, error, result))
+    return results
+
+def convert_device(device, output_dir, options):
+    """
+    Convert a single device, see svd2cpp.convert()
+    """
+    import svd2cpp
+    print('Converting SVD file:', device['svd_file'])
+    svd2cpp.convert(device['svd_file'], device.get('ignore_cluster', ''), generate_dir=device_dir(device, output_dir), env=_env, **options)
+
+def build_device(device, options):
+    """
+    Build the model of a single device, see svd2cpp.build_model()
+    """
+    import svd2cpp
+    print('Converting SVD file:', device['svd_file'])
+    return svd2cpp.build_model(device['svd_file'], device.get('ignore_cluster', ''), **options)
+
+def device_inputs(device, split_groups, arguments):
+    """
+    Inputs of the files generated for a single device, see svd2cpp.generate_inputs()
+    """
+    import svd2cpp
+    return svd2cpp.generate_inputs(device['svd_file'], {'ignore_cluster': device.get('ignore_cluster', ''), 'split_groups': split_groups} | arguments)
+
+def generate_device(device, output_dir, model, inputs, split_groups, force=False):
+    """
+    Generate the files of a single device from its model (see build_device()), see svd2cpp.update_generated().
+    The files are not generated again if the inputs are unchanged (see svd2cpp.generate_up_to_date()), unless forced.
+    """
+    import svd2cpp
+    generate_dir = device_dir(device, output_dir)
+    if not force and svd2cpp.generate_up_to_date(generate_dir, inputs):
+        print(f'Generated files in {generate_dir} are up to date, skipping generation')
+        return
+    svd2cpp.update_generated(*model, generate_dir, _env, split_groups, inputs)
+
+def shared_inputs(devices, split_groups, arguments):
+    """
+    Inputs of the files generated for each device with a shared header (see convert_batch()), and of the shared header.
+    The shared groups depend on all devices, so the inputs of each device include the SVD file and ignore cluster regex
+    of all devices, and the inputs of the shared header are those of all devices.
+    """
+    import svd_cache
+    arguments = arguments | {'shared_devices': [[svd_cache.file_hash(device['svd_file']), device.get('ignore_cluster', '')] for device in devices]}
+    inputs = [device_inputs(device, split_groups, arguments) for device in devices]
+    return inputs, {'shared_header': arguments['shared_header'], 'devices': inputs}
+
+def worker_count(jobs, devices):
+    """
+    Amount of worker processes converting the devices: the given amount of jobs (all processors if jobs is 0 or None),
+    but at most one for each device
+    """
+    return min(jobs or os.cpu_count(), len(devices))
+
+def convert_batch(devices, output_dir, jobs=1, force=False, split_groups=False, shared_name=None, **options):
+    """
+    Convert all devices, each a dictionary with the keys 'svd_file' and optionally 'ignore_cluster' and 'output_dir'.
+    The devices are converted by the given amount of worker processes (all processors if jobs is 0 or None), the
+    remaining options are passed to svd2cpp.build_model().
+    With a shared name, the interfaces of the groups equal in all devices are generated in a single shared header in
+    the output directory (see svd2cpp.generate_shared()), for which the models of all devices are built before any of
+    the devices is generated. The shared groups depend on all devices, so the inputs of each device include those of
+    all devices, and the conversion is skipped if the files of all devices and the shared header are up to date,
+    unless forced.
+    Returns a list with the conversion time and error (None if successful) of each device.
+    """
+    jobs = worker_count(jobs, devices)
+    # The compiled templates are stored next to the cached device models
+    bytecode_cache_dir = os.path.join(options['cache_dir'], 'templates') if options.get('cache_dir') else None
+    with contextlib.ExitStack() as stack:
+        if jobs > 1:
+            executor = stack.enter_context(ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(bytecode_cache_dir,)))
+        else:
+            executor = None
+            init_worker(bytecode_cache_dir)
+        if not shared_name:
+            convert_options = options | {'force': force, 'split_groups': split_groups}
+            results = map_devices(executor, convert_device, [(device, output_dir, convert_options) for device in devices])
+            return [(duration, error) for duration, error, _ in results]
+
+        import svd2cpp
+        import svd_cleanup
+        start = time.perf_counter()
+        arguments = {'dedup_groups': options.get('dedup_groups', False), 'set_reset': options.get('set_reset', svd2cpp.DEFAULT_SET_RESET), 'bit_band': options.get('bit_band', ''), 'shared_header': shared_name}
+        inputs, header_inputs = shared_inputs(devices, split_groups, arguments)
+        if not force and svd2cpp.generate_up_to_date(output_dir, header_inputs) and all(svd2cpp.generate_up_to_date(device_dir(device, output_dir), device_input) for device, device_input in zip(devices, inputs)):
+            print(f'Generated files of all devices in {output_dir} are up to date, skipping conversion')
+            return [(time.perf_counter() - start, None)] * len(devices)
+
+        build_results = map_devices(executor, build_device, [(device, options) for device in devices])
+        built = [(device, model) for device, (_, error, model) in zip(devices, build_results) if error is None]
+        if len(built) != len(devices):
+            # Only the built devices are shared, which their inputs reflect, such that these are generated again once
+            # all devices are built
+            inputs, header_inputs = shared_inputs([device for device, _ in built], split_groups, arguments)
+        # Only the interfaces equal in all (successfully built) devices are shared
+        groups_list = [groups for _, (_, groups, _) in built]
+        shared_groups = svd_cleanup.find_shared_groups(groups_list) if len(built) > 1 else []
+        print(f'Found {len(shared_groups)} groups shared by {len(built)} devices: {', '.join(shared_groups)}')
+        if shared_groups:
+            device_models = [device_model for _, (device_model, _, _) in built]
+            shared_file = svd2cpp.generate_shared(device_models, [groups_list[0][name] for name in shared_groups], shared_name, output_dir, _env or svd2cpp.create_environment(bytecode_cache_dir), header_inputs, force)
+            for device, (_, groups, _) in built:
+                shared_header = os.path.relpath(shared_file, device_dir(device, output_dir)).replace(os.sep, '/')
+                for name in shared_groups:
+                    groups[name].shared_header = shared_header
+        else:
+            # Without a shared header, only its inputs are stored, such that an unchanged conversion is skipped
+            svd2cpp.write_generate_manifest(output_dir, header_inputs, [])
+
+        generate_results = iter(map_devices(executor, generate_device, [(device, output_dir, model, device_input, split_groups, force) for (device, model), device_input in zip(built, inputs)]))
+
+        results = []
+        for duration, error, _ in build_results:
+            if error is None:
+                generate_duration, error, _ = next(generate_results)
+                duration += generate_duration
+            results.append((duration, error))
+        return results
+
+def print_summary(devices, results, total_duration):
+    name_width = max(len(device['svd_file']) for device in devices)
+    print()
+    print(f'{'SVD file':<{name_width}}  {'Time':>8}  Result')
+    for device, (duration, error) in zip(devices, results):
+        print(f'{device['svd_file']:<{name_width}}  {duration:>7.2f}s  {error or 'OK'}')
+    print(f'{'Total':<{name_width}}  {total_duration:>7.2f}s  {sum(error is None for _, error in results)}/{len(results)} converted')
+
+
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+    import sys
+    import svd2cpp
+    # Required for the worker processes in the binary distribution
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(prog='svd_batch', description='Convert multiple CMSIS SVD files to modern C++ interfaces')
+    parser.add_argument('svd_files', type=str, nargs='*', help='Paths or glob patterns of the SVD files to convert')
+    parser.add_argument('--manifest', type=str, help='JSON file listing the devices to convert, with per device options', default=None)
+    parser.add_argument('--ignore_cluster', type=str, help='Regex indicating which clusters to ignore for all svd_files, passed to svd_cleanup', default='')
+    parser.add_argument('--output_dir', type=str, help='Directory in which a directory is generated for each device', default=os.path.join(os.path.abspath(os.path.dirname(__file__)), 'generated'))
+    parser.add_argument('--cluster_engine', type=str, help='Engine used to find repeating registers, passed to svd_cleanup (both result in equal clusters)', choices=['search', 'signature'], default='search')
+    parser.add_argument('--parser', type=str, help='Parser used to read the SVD files, passed to svd_cleanup (both result in equal output)', choices=['cmsis_svd', 'stream'], default='cmsis_svd')
+    parser.add_argument('--cache_dir', type=str, help='Directory in which the device models are cached after each stage', default=None)
+    parser.add_argument('--cache_size', type=int, help='Maximum size of the cache directory in MiB', default=256)
+    parser.add_argument('--no_cache', action='store_true', help='Do not read or write the device model cache')
+    parser.add_argument('--split_groups', action='store_true', help='Generate a header for each peripheral group, included by the device header')
+    parser.add_argument('--dedup_groups', action='store_true', help='Generate a single interface for groups with equal registers, other groups use an alias')
+    parser.add_argument('--set_reset', type=str, help=f'Comma separated set/reset alias registers REGISTER:ALIAS:SET_SHIFT:RESET_SHIFT, of which bits are set and cleared with a single write, empty to disable (default {svd2cpp.DEFAULT_SET_RESET})', default=svd2cpp.DEFAULT_SET_RESET)
+    parser.add_argument('--bit_band', type=str, help='Comma separated bit-band regions BASE:SIZE:ALIAS, of which single bits are set and cleared with a single write, or auto for the regions of the Cortex-M3 and Cortex-M4', default='')
+    parser.add_argument('--shared_header', type=str, help='Name of the header in output_dir with the interfaces of the groups equal in all devices, which is included by the device headers', default=None)
+    parser.add_argument('--force', action='store_true', help='Convert the SVD files even if all inputs are equal to those of the previous conversion')
+    parser.add_argument('--jobs', type=int, help='Amount of devices converted in parallel, 0 to use all processors', default=0)
+    args = parser.parse_args()
+
+    devices = find_devices(args.svd_files, args.ignore_cluster)
+    if args.manifest:
+        devices += read_manifest(args.manifest)
+    if not devices:
+        parser.error('no SVD files or manifest provided')
+
+    import svd_cache
+    cache_dir = None if args.no_cache else (args.cache_dir or svd_cache.DEFAULT_CACHE_DIR)
+    print(f'Converting {len(devices)} SVD files with {worker_count(args.jobs, devices)} jobs')
+    start = time.perf_counter()
+    results = convert_batch(devices, args.output_dir, args.jobs, cluster_engine=args.cluster_engine, svd_parser=args.parser, cache_dir=cache_dir, cache_size=args.cache_size * 1024 * 1024, force=args.force, split_groups=args.split_groups, shared_name=args.shared_header, dedup_groups=args.dedup_groups, set_reset=args.set_reset, bit_band=args.bit_band)
+    print_summary(devices, results, time.perf_counter() - start)
+
+    if any(error is not None for _, error in results):
+        sys.exit(1)
+    print()
+    print('All done!')
@@ -0,0 +1,285 @@
+"""
+Benchmark each stage of svd2cpp.convert() on the bundled SVD files, to find out whether a change makes the conversion
+faster or slower.
+For each stage (see STAGES) the wall time, the peak memory (traced in a separate run, as tracing slows down the stages
+considerably) and the size of its output (the pickled device model, or the generated files) are recorded.
+The startup time is the time of a conversion by the svd2cpp command line which is skipped, as all inputs are unchanged
+(e.g., when a build system regenerates), which should stay below STARTUP_TARGET.
+Additionally, the clustering of synthetic groups with a growing amount of registers shows how find_run() scales:
+ * repeating: registers CH0CR, CH1CR, ... which are all clustered into a single cluster
+ * unique: registers which all differ, so every run is tried without finding any cluster
+
+The results are stored as JSON, and can be compared to a stored baseline, in which case every stage that became
+slower or used more memory than the tolerance is reported as regression:
+    uv run svd_benchmark.py --output baseline.json
+    uv run svd_benchmark.py --compare baseline.json
+"""
+import contextlib
+import io
+import json
+import math
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import svd2cpp
+import svd_cleanup
+import svd_model
+
+# Increment whenever the stored results change
+BENCHMARK_FORMAT = 1
+DEFAULT_SVD_FILES = ['svd/STM32H745_CM4.svd', 'svd/STM32H745_CM7.svd', 'svd/STM32L552.svd']
+STAGES = ['parse_svd', 'group_peripherals', 'simplify_registers', 'clean_registers', 'cluster_registers', 'list_interrupts', 'generate']
+SCALING_SHAPES = ['repeating', 'unique']
+DEFAULT_SCALING_SIZES = [8, 16, 32, 64, 128]
+# Differences below these are considered noise, and never reported as regression
+MIN_TIME_DIFFERENCE = 0.01
+MIN_MEMORY_DIFFERENCE = 64 * 1024
+MIN_STARTUP_DIFFERENCE = 0.005
+# Target of the startup time (seconds), see benchmark_startup()
+STARTUP_TARGET = 0.1
+
+
+def run_stages(svd_file, ignore_cluster_regex, cluster_engine, svd_parser, generate_dir, trace_memory=False):
+    """
+    Run all stages once on the SVD file, returns a dictionary with for each stage the time, peak memory (only if traced)
+    and output size
+    """
+    model = {}
+
+    def generate():
+        svd2cpp.generate(model['device'], model['groups'], model['interrupts'], generate_dir)
+        return sum(entry.stat().st_size for entry in os.scandir(generate_dir))
+
+    stages = {
+        'parse_svd': lambda: model.update(device=svd_cleanup.parse_svd(svd_file, svd_parser)),
+        'group_peripherals': lambda: model.update(groups=svd_cleanup.group_peripherals(model['device'])),
+        'simplify_registers': lambda: svd_cleanup.simplify_registers(model['groups']),
+        'clean_registers': lambda: svd_cleanup.clean_registers(model['groups']),
+        'cluster_registers': lambda: svd_cleanup.cluster_registers(model['groups'], ignore_cluster_regex, cluster_engine),
+        'list_interrupts': lambda: model.update(interrupts=svd2cpp.list_interrupts(model['device'])),
+        'generate': generate,
+    }
+    # The output of each stage which is not generating files
+    outputs = {'parse_svd': 'device', 'list_interrupts': 'interrupts'}
+
+    # Start without memoized diffs, such that each run does equal work
+    svd_cleanup.diff_main_cached.cache_clear()
+    results = {}
+    for stage in STAGES:
+        if trace_memory:
+            tracemalloc.start()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            output_size = stages[stage]()
+        duration = time.perf_counter() - start
+        peak_memory = None
+        if trace_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1] - start_memory
+            tracemalloc.stop()
+        if output_size is None:
+            output_size = len(pickle.dumps(model[outputs.get(stage, 'groups')], protocol=pickle.HIGHEST_PROTOCOL))
+        results[stage] = {'time': duration, 'peak_memory': peak_memory, 'output_size': output_size}
+    return results
+
+def benchmark_svd(svd_file, ignore_cluster_regex='', cluster_engine='search', svd_parser='cmsis_svd', repeat=3, trace_memory=True):
+    """
+    Benchmark all stages on the SVD file, using the fastest time of the repeated runs, and the peak memory of an
+    additional traced run
+    """
+    runs = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Each run generates into a new directory, as unchanged files are not written
+        for idx in range(repeat):
+            runs.append(run_stages(svd_file, ignore_cluster_regex, cluster_engine, svd_parser, os.path.join(temp_dir, f'run{idx}')))
+        if trace_memory:
+            traced = run_stages(svd_file, ignore_cluster_regex, cluster_engine, svd_parser, os.path.join(temp_dir, 'traced'), True)
+
+    results = {}
+    for stage in STAGES:
+        results[stage] = {
+            'time': min(run[stage]['time'] for run in runs),
+            'peak_memory': traced[stage]['peak_memory'] if trace_memory else None,
+            'output_size': runs[0][stage]['output_size'],
+        }
+    return results
+
+def benchmark_startup(svd_file, ignore_cluster_regex='', repeat=3):
+    """
+    Measure the fastest time of the svd2cpp command line converting the SVD file into a directory of which the generated
+    files are up to date, i.e., the time to start, check the inputs and skip the conversion
+    """
+    script_dir = os.path.dirname(os.path.abspath(svd2cpp.__file__))
+    durations = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        command = [sys.executable, os.path.join(script_dir, 'svd2cpp.py'), os.path.abspath(svd_file), '--ignore_cluster', ignore_cluster_regex, '--output_dir', temp_dir]
+        # The first conversion generates the files, and stores the compiled templates
+        subprocess.run(command, cwd=script_dir, stdout=subprocess.DEVNULL, check=True)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run(command, cwd=script_dir, stdout=subprocess.DEVNULL, check=True)
+            durations.append(time.perf_counter() - start)
+    return min(durations)
+
+def synthetic_registers(count, shape):
+    """
+    Create a list of registers for the synthetic scaling benchmark, see SCALING_SHAPES
+    """
+    registers = []
+    for idx in range(count):
+        fields = [
+            svd_model.Field(name=name, description=f'{description} of channel {idx}', bit_offset=bit_offset, bit_width=bit_width, access='read-write')
+            for name, description, bit_offset, bit_width in [('EN', 'Enable', 0, 1), ('MODE', 'Mode selection', 1, 3), ('PRIO', 'Priority level', 8, 4)]
+        ]
+        registers.append(svd_model.Register(
+            size=32, access='read-write',
+            # Registers with different reset values are never clustered
+            reset_value=0 if shape == 'repeating' else idx, reset_mask=0xFFFFFFFF,
+            name=f'CH{idx}CR' if shape == 'repeating' else f'REG{idx}', description=f'Channel {idx} control register',
+            address_offset=idx * 4, fields=fields,
+        ))
+    return registers
+
+def benchmark_scaling(sizes, cluster_engine='search', repeat=3):
+    """
+    Measure the time to cluster synthetic groups of each size and shape (see synthetic_registers()).
+    The growth is the exponent of the time as a function of the size, between the two largest sizes.
+    """
+    results = {'cluster_engine': cluster_engine, 'times': {}, 'growth': {}}
+    for shape in SCALING_SHAPES:
+        times = {}
+        for size in sizes:
+            durations = []
+            for _ in range(repeat):
+                groups = {'SYN': svd_model.Group('SYN', 'Synthetic group', synthetic_registers(size, shape), [])}
+                svd_cleanup.diff_main_cached.cache_clear()
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    svd_cleanup.cluster_registers(groups, '', cluster_engine)
+                durations.append(time.perf_counter() - start)
+            times[str(size)] = min(durations)
+        results['times'][shape] = times
+        if len(sizes) > 1:
+            (size1, time1), (size2, time2) = sorted((int(size), duration) for size, duration in times.items())[-2:]
+            results['growth'][shape] = math.log(time2 / time1) / math.log(size2 / size1) if time1 > 0 and time2 > 0 else None
+    return results
+
+def compare_results(results, baseline, tolerance):
+    """
+    Compare the results to the baseline, returns a list of regressions, each a tuple (name, measurement, baseline value,
+    result value). The output sizes are compared exactly, as any change indicates a change in the conversion.
+    """
+    regressions = []
+
+    def compare(name, measurement, baseline_value, value, min_difference):
+        if baseline_value is None or value is None:
+            return
+        if value > baseline_value * (1 + tolerance) and value - baseline_value > min_difference:
+            regressions.append((name, measurement, baseline_value, value))
+
+    for svd_file, stages in results['devices'].items():
+        for stage, result in stages.items():
+            baseline_result = baseline.get('devices', {}).get(svd_file, {}).get(stage)
+            if baseline_result is None:
+                continue
+            name = f'{svd_file} {stage}'
+            compare(name, 'time', baseline_result['time'], result['time'], MIN_TIME_DIFFERENCE)
+            compare(name, 'peak_memory', baseline_result['peak_memory'], result['peak_memory'], MIN_MEMORY_DIFFERENCE)
+            if baseline_result['output_size'] != result['output_size']:
+                regressions.append((name, 'output_size', baseline_result['output_size'], result['output_size']))
+
+    for svd_file, duration in results.get('startup', {}).items():
+        compare(f'{svd_file} startup', 'time', baseline.get('startup', {}).get(svd_file), duration, MIN_STARTUP_DIFFERENCE)
+
+    if 'scaling' in results and 'scaling' in baseline and results['scaling']['cluster_engine'] == baseline['scaling']['cluster_engine']:
+        for shape, times in results['scaling']['times'].items():
+            for size, duration in times.items():
+                compare(f'scaling {shape} {size}', 'time', baseline['scaling']['times'].get(shape, {}).get(size), duration, MIN_TIME_DIFFERENCE)
+    return regressions
+
+def print_results(results):
+    for svd_file, stages in results['devices'].items():
+        print()
+        print(f'{svd_file:<24}  {'Time':>10}  {'Peak memory':>12}  {'Output size':>12}')
+        for stage, result in stages.items():
+            peak_memory = f'{result['peak_memory'] / 1024 / 1024:>10.1f}MB' if result['peak_memory'] is not None else f'{'-':>12}'
+            print(f'{stage:<24}  {result['time'] * 1000:>8.1f}ms  {peak_memory}  {result['output_size'] / 1024:>10.1f}kB')
+        print(f'{'Total':<24}  {sum(result['time'] for result in stages.values()) * 1000:>8.1f}ms')
+    if 'startup' in results:
+        print()
+        print(f'Startup of a skipped conversion (target {STARTUP_TARGET * 1000:.0f}ms)')
+        for svd_file, duration in results['startup'].items():
+            print(f'{svd_file:<24}  {duration * 1000:>8.1f}ms  {'OK' if duration <= STARTUP_TARGET else 'above target'}')
+    if 'scaling' in results:
+        scaling = results['scaling']
+        print()
+        print(f'Clustering synthetic groups with engine {scaling['cluster_engine']}')
+        for shape, times in scaling['times'].items():
+            growth = scaling['growth'].get(shape)
+            print(f'{shape:<10} ' + '  '.join(f'{size:>4}: {duration * 1000:>8.1f}ms' for size, duration in times.items()) + (f'  growth: O(n^{growth:.2f})' if growth is not None else ''))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='svd_benchmark', description='Benchmark each stage of the conversion of SVD files')
+    parser.add_argument('svd_files', type=str, nargs='*', help='Paths to the SVD files to benchmark, by default the bundled SVD files', default=DEFAULT_SVD_FILES)
+    parser.add_argument('--ignore_cluster', type=str, help='Regex indicating which clusters to ignore, passed to svd_cleanup', default='')
+    parser.add_argument('--cluster_engine', type=str, help='Engine used to find repeating registers, passed to svd_cleanup', choices=svd_cleanup.CLUSTER_ENGINES, default='search')
+    parser.add_argument('--parser', type=str, help='Parser used to read the SVD files, passed to svd_cleanup', choices=svd_cleanup.SVD_PARSERS, default='cmsis_svd')
+    parser.add_argument('--repeat', type=int, help='Amount of runs of which the fastest time is used', default=3)
+    parser.add_argument('--no_memory', action='store_true', help='Do not trace the peak memory, which requires an additional run')
+    parser.add_argument('--no_startup', action='store_true', help='Do not measure the startup time of a skipped conversion')
+    parser.add_argument('--scaling_sizes', type=int, nargs='*', help='Amount of registers in the synthetic groups, none to skip the scaling benchmark', default=DEFAULT_SCALING_SIZES)
+    parser.add_argument('--output', type=str, help='Path of the JSON file to store the results', default='svd_benchmark.json')
+    parser.add_argument('--compare', type=str, help='Path of a JSON file with baseline results, to report regressions', default=None)
+    parser.add_argument('--tolerance', type=float, help='Relative increase in time or memory compared to the baseline which is reported as regression', default=0.1)
+    args = parser.parse_args()
+
+    results = {
+        'format': BENCHMARK_FORMAT,
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'processor': platform.processor()},
+        'arguments': {'ignore_cluster': args.ignore_cluster, 'cluster_engine': args.cluster_engine, 'parser': args.parser},
+        'repeat': args.repeat,
+        'devices': {},
+    }
+    for svd_file in args.svd_files:
+        print(f'Benchmarking {svd_file}...')
+        results['devices'][os.path.basename(svd_file)] = benchmark_svd(svd_file, args.ignore_cluster, args.cluster_engine, args.parser, args.repeat, not args.no_memory)
+    if not args.no_startup:
+        print('Benchmarking startup of skipped conversions...')
+        results['startup'] = {os.path.basename(svd_file): benchmark_startup(svd_file, args.ignore_cluster, args.repeat) for svd_file in args.svd_files}
+    if args.scaling_sizes:
+        print('Benchmarking clustering of synthetic groups...')
+        results['scaling'] = benchmark_scaling(args.scaling_sizes, args.cluster_engine, args.repeat)
+    print_results(results)
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=4)
+    print()
+    print(f'Stored results in {args.output}')
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if baseline.get('format') != BENCHMARK_FORMAT:
+            sys.exit(f'Baseline {args.compare} has format {baseline.get('format')}, expected {BENCHMARK_FORMAT}')
+        if baseline.get('arguments') != results['arguments']:
+            print(f'Warning: baseline {args.compare} was run with different arguments {baseline.get('arguments')}')
+        regressions = compare_results(results, baseline, args.tolerance)
+        print()
+        if regressions:
+            print(f'Found {len(regressions)} regressions compared to {args.compare}:')
+            for name, measurement, baseline_value, value in regressions:
+                if measurement == 'time':
+                    print(f'  {name} {measurement}: {baseline_value * 1000:.1f}ms -> {value * 1000:.1f}ms')
+                else:
+                    print(f'  {name} {measurement}: {baseline_value} -> {value}')
+            sys.exit(1)
+        print(f'No regressions compared to {args.compare}')
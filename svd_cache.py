@@ -0,0 +1,119 @@
+"""
+Content-addressed on-disk cache of the device model after each conversion stage.
+
+Each stage result is stored under a key that is derived from the SVD file contents, the version of the code building
+the device model, and the parameters of the stage and all stages before it.
+A rerun restarts from the deepest stage found in the cache, e.g., changing only the ignore cluster regex restarts from
+the cleaned device model, and changing nothing (or only templates) restarts from the clustered device model.
+"""
+import hashlib
+import os
+
+# Increment whenever the stored format changes
+CACHE_FORMAT = 2
+# Modules that build the device model (svd2cpp runs the stages, see svd2cpp.build_model()), any change to these
+# invalidates the cache
+MODEL_SOURCES = ['svd2cpp.py', 'svd_cleanup.py', 'svd_model.py', 'svd_parser.py']
+DEFAULT_CACHE_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), '.cache')
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+
+def model_version():
+    """
+    Hash of the code building the device model, used as tool version in the cache keys
+    """
+    version = hashlib.sha256(f'cache format {CACHE_FORMAT}'.encode())
+    for source in MODEL_SOURCES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), source), 'rb') as file:
+            version.update(file.read())
+    return version.hexdigest()
+
+def file_hash(path):
+    with open(path, 'rb') as file:
+        return hashlib.file_digest(file, 'sha256').hexdigest()
+
+def stage_keys(svd_file, stages):
+    """
+    Calculate the cache key for each stage, where each key includes the key of the previous stage
+    """
+    keys = []
+    key = hashlib.sha256(f'{file_hash(svd_file)} {model_version()}'.encode()).hexdigest()
+    for name, _, parameters in stages:
+        key = hashlib.sha256(f'{key} {name} {sorted(parameters.items())!r}'.encode()).hexdigest()
+        keys.append(key)
+    return keys
+
+def load(cache_dir, key):
+    """
+    Load a cached device model, or None if it is not available
+    """
+    import pickle
+    path = os.path.join(cache_dir, f'{key}.pickle')
+    try:
+        with open(path, 'rb') as file:
+            model = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f'Removing invalid cache file {path}: {e}')
+        os.remove(path)
+        return None
+    # Mark as recently used, for eviction
+    os.utime(path)
+    return model
+
+def store(cache_dir, key, model):
+    """
+    Store a device model in the cache, the file is written atomically so concurrent runs never read partial files
+    """
+    import pickle
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f'{key}.pickle')
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as file:
+        pickle.dump(model, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+
+def evict(cache_dir, max_size):
+    """
+    Remove the least recently used cache files until the total size is at most max_size bytes
+    """
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.name.endswith('.pickle'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total_size = 0
+    for _, size, path in sorted(entries, reverse=True):
+        total_size += size
+        if total_size > max_size:
+            os.remove(path)
+
+def run_stages(svd_file, stages, cache_dir=None, max_size=DEFAULT_CACHE_SIZE):
+    """
+    Run all stages on the device model, starting from the deepest stage available in the cache.
+    Each stage is a tuple (name, function, parameters), where the function modifies the model dictionary in place and
+    the parameters are a dictionary of all arguments that influence the result of the stage.
+    Caching is disabled if no cache_dir is provided.
+    Returns the model dictionary after the last stage.
+    """
+    model = {}
+    start = 0
+    keys = stage_keys(svd_file, stages) if cache_dir else []
+    for idx in reversed(range(len(keys))):
+        cached = load(cache_dir, keys[idx])
+        if cached is not None:
+            print(f'Using cached {stages[idx][0]} device model for {svd_file}')
+            model = cached
+            start = idx + 1
+            break
+
+    for idx in range(start, len(stages)):
+        stages[idx][1](model)
+        if cache_dir:
+            store(cache_dir, keys[idx], model)
+
+    if cache_dir:
+        evict(cache_dir, max_size)
+    return model
@@ -1,60 +1,119 @@
 
-from functools import reduce
-from diff_match_patch import diff_match_patch
-_dmp = diff_match_patch()
+import contextlib
+import dataclasses
+import io
+import operator
+import os
+import re
+import time
+from functools import reduce, lru_cache
+import svd_model
+# diff_match_patch instance, only imported once clustering needs it, see load_dmp()
+_dmp = None
+_digit_runs = re.compile(r'[0-9]+')
+# Fingerprints of registers, fields and clusters by id, see item_fingerprint()
+_fingerprints = {}
+# Amount of string diffs resolved by the fast and general path, see diff_strings()
+# The memo hits and misses only count those of worker processes, see map_groups()
+_diff_counts = {'fast': 0, 'general': 0, 'hits': 0, 'misses': 0}
+# Counters of the hot paths of clustering, see profile_statistics()
+_profile_counts = {
+    'run_candidates': 0, # (run length, run repeat) pairs tried by check_run()
+    'repeat_checks': 0, # calls to check_registers_repeat()
+    'repeat_rejections': 0, # calls to check_registers_repeat() without repeat
+    'similar_checks': 0, # calls to check_items_similar(), including recursive calls
+    'similar_max_depth': 0, # maximum recursion depth of check_items_similar()
+    'overlap_calls': 0, # calls to find_string_overlap()
+    'overlap_input_length': 0, # total length of all strings passed to find_string_overlap()
+    'diff_main_calls': 0, # calls to diff_match_patch.diff_main(), i.e., general diffs not memoized
+    'diff_main_input_length': 0, # total length of all strings passed to diff_match_patch.diff_main()
+}
+# Time and counters of each group, for each function applied by map_groups(), see profile_statistics()
+_group_profiles = {}
 
-def parse_svd(svd_file : str) -> dict:
+# Keys of registers, fields and clusters that are allowed to differ between similar items (see check_items_similar)
+SIMILAR_IGNORED_KEYS = ['display_name', 'description', 'address_offset', 'enumerated_values', 'header_struct_name']
+# Keys of registers, fields and clusters that must be equal between similar items
+SIMILAR_VALUE_KEYS = ['name', 'size', 'access', 'protection', 'reset_value', 'reset_mask', 'dim', 'dim_increment', 'dim_index', 'dim_name', 'dim_array_index', 'alternate_group', 'alternate_register', 'data_type', 'modified_write_values', 'write_constraint', 'read_action', 'derived_from', 'bit_offset', 'bit_width', 'lsb', 'msb', 'bit_range', 'alternate_cluster', 'set_reset', 'bit_band']
+# Keys of registers, fields and clusters containing a list of items that must be recursively similar
+SIMILAR_LIST_KEYS = ['registers', 'fields', 'clusters']
+# Keys of registers, fields, clusters and enumerated values that only end up in comments of the generated interface,
+# which are allowed to differ between equal groups (see deduplicate_groups)
+INTERFACE_IGNORED_KEYS = ['display_name', 'description']
+# Engines available to find repeating runs of registers (see cluster_registers)
+CLUSTER_ENGINES = ['search', 'signature']
+# Base and (prime) modulus of the polynomial hashes of the register signatures, see signature_table()
+SIGNATURE_HASH_BASE = 1000003
+SIGNATURE_HASH_MODULUS = (1 << 61) - 1
+# Properties of each run (see check_run()) recorded in the cluster plan, see cluster_registers_list()
+CLUSTER_PLAN_RUN_KEYS = ['offset', 'name', 'index', 'increment', 'length', 'repeat', 'post']
+# Parsers available to read the SVD file (see parse_svd)
+SVD_PARSERS = ['cmsis_svd', 'stream']
+# Properties of a group which are passed to and from the worker processes, see map_groups()
+GROUP_JOB_KEYS = ['name', 'description', 'registers', 'cluster_plan']
+
+def parse_svd(svd_file : str, parser : str = 'cmsis_svd') -> svd_model.Device:
+    """
+    Parse the SVD file into the device model (see svd_model), using either of the SVD_PARSERS:
+     * cmsis_svd: build the cmsis_svd device model, and convert it to a dictionary
+     * stream: incrementally parse the SVD file directly into the same dictionary, see svd_parser
+    The dictionary is converted into the device model, see svd_model.device_from_dict()
+    """
+    if parser not in SVD_PARSERS:
+        raise ValueError(f'Unknown SVD parser {parser}, expected one of {SVD_PARSERS}')
+    if parser == 'stream':
+        import svd_parser
+        return svd_model.device_from_dict(svd_parser.parse_svd(svd_file))
     from cmsis_svd import SVDParser
     parser = SVDParser.for_xml_file(svd_file)
     device = parser.get_device().to_dict()
-    return device
+    return svd_model.device_from_dict(device)
 
 def group_peripherals(device):
     """
     Parse the SVD device (result of parse_svd()) and find all peripherals that have a matching group.
-    Returns a list with, for each of these groups, a dictionary with the following properties:
+    Returns a dictionary with, for each of these groups by name, a svd_model.Group with the following properties:
      * name: the group name of all the peripherals in the group
      * registers: the registers of all the peripherals in the group
      * peripherals: a list of all peripherals belonging to the group, excluding their registers
     """
     groups = {}
-    for peripheral in device['peripherals']:
+    for peripheral in device.peripherals:
         # Create a group with common registers and/or add peripheral to its corresponding group
         if peripheral['group_name'] not in groups:
-            group = {
-                'name': peripheral['group_name'],
-                'registers': peripheral['registers'],
-                'description': peripheral['description'],
-                'peripherals': [peripheral],
-            }
+            group = svd_model.Group(
+                name=peripheral['group_name'],
+                registers=peripheral['registers'],
+                description=peripheral['description'],
+                peripherals=[peripheral],
+            )
             groups[peripheral['group_name']] = group
         else:
-            groups[peripheral['group_name']]['peripherals'].append(peripheral)
+            groups[peripheral['group_name']].peripherals.append(peripheral)
         # Delete the grouped items from this peripheral, only the common defintion should be used
         del peripheral['description']
         del peripheral['registers']
     return groups
 
-def simplify_registers(groups):
+def simplify_registers(groups, jobs=1):
     """
     Recursively remove 'meta_clusters' which are then replaced by their internal registers
     This simplifies the register strucutre
+    The groups are processed by the given amount of jobs, see map_groups()
     """
-    for group in groups.values():
-        simplify_registers_list(group['registers'])
+    map_groups(groups, simplify_group, jobs=jobs)
 
-def clean_registers(groups):
+def clean_registers(groups, jobs=1):
     """
     Perform some cleanup operations on the register groups resulting from group_peripherals():
      - All registers are sorted by their address offset
      - All fields in the registers are sorted by their bit offset
      - All duplicate whitespace characters from descriptions are stripped and/or replaced by spaces
+    The groups are processed by the given amount of jobs, see map_groups()
     """
-    for group in groups.values():
-        group['description'] = clean_description(group['description'])
-        clean_registers_list(group['registers'])
+    map_groups(groups, clean_group, jobs=jobs)
 
-def cluster_registers(groups, ignore_cluster_regex=''):
+def cluster_registers(groups, ignore_cluster_regex='', engine='search', jobs=1, plan=None):
     """
     The input of this function is the result of group_peripherals().
     If the SVD file contains clusters, then these require to be
@@ -69,11 +128,230 @@ def cluster_registers(groups, ignore_cluster_regex=''):
 
     The ignore cluster regex argument can optionally be used to indicate which identified clusters should be ignored.
     By default all possible clusters are used.
+
+    The engine argument selects how runs are found, both engines result in the same clusters:
+      - 'search': try every (run length, run repeat) pair, see find_run()
+      - 'signature': only try the pairs for which the register signatures repeat, see find_run_signature()
+
+    Each group records the runs found in each of its lists of registers, and whether these were accepted, as its
+    'cluster_plan' (see cluster_registers_list()). With a plan (the 'cluster_plan' of each group, by group name), the
+    recorded runs are applied instead of searching for runs, as long as these still hold (see check_planned_runs()).
+
+    The groups are processed by the given amount of jobs, see map_groups()
     """
-    import re
+    if engine not in CLUSTER_ENGINES:
+        raise ValueError(f'Unknown cluster engine {engine}, expected one of {CLUSTER_ENGINES}')
     cluster_ignore = re.compile(ignore_cluster_regex)
+    invalidate_fingerprints()
+    map_groups(groups, cluster_group, cluster_ignore, engine, plan, jobs=jobs)
+    # The fingerprints hold on to their items, which are of no use after clustering
+    invalidate_fingerprints()
+
+def map_groups(groups, function, *arguments, jobs=1):
+    """
+    Call function(group, *arguments) for each group, which modifies the properties of the group in GROUP_JOB_KEYS.
+    With more than one job, the groups are processed in a pool of worker processes (all processors if jobs is 0 or None).
+    Each worker receives a copy of these properties of the group, and the results are merged back in the order of the groups, including the
+    printed log of each group, so the result is equal to processing the groups one after another.
+    The time and counters of each group are recorded, see profile_statistics().
+    """
+    jobs = jobs or os.cpu_count()
+    profiles = _group_profiles.setdefault(function.__name__, {})
+    if jobs == 1 or len(groups) < 2:
+        for group in groups.values():
+            register_count = len(group.registers)
+            duration, counts = run_profiled(function, group, arguments)
+            profiles[group.name] = {'time': duration, 'registers': register_count} | counts
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(min(jobs, len(groups))) as executor:
+        futures = [executor.submit(run_group_job, function, svd_model.Group(**{key: getattr(group, key) for key in GROUP_JOB_KEYS}), arguments) for group in groups.values()]
+        # Merge each result as soon as all groups before it are done
+        for group, future in zip(groups.values(), futures):
+            register_count = len(group.registers)
+            result, log, duration, counts = future.result()
+            for key in GROUP_JOB_KEYS:
+                setattr(group, key, getattr(result, key))
+            print(log, end='')
+            merge_profile_counts(counts)
+            profiles[group.name] = {'time': duration, 'registers': register_count} | counts
+
+def run_group_job(function, group, arguments):
+    """
+    Run function(group, *arguments) in a worker process (see map_groups()).
+    Returns the modified group, its printed log, and the time and counters of this group
+    """
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        duration, counts = run_profiled(function, group, arguments)
+    return group, log.getvalue(), duration, counts
+
+def run_profiled(function, group, arguments):
+    """
+    Call function(group, *arguments), returns its duration and the counters of this call only (see profile_statistics())
+    """
+    counts = profile_counts()
+    max_depth = _profile_counts['similar_max_depth']
+    _profile_counts['similar_max_depth'] = 0
+    start = time.perf_counter()
+    function(group, *arguments)
+    duration = time.perf_counter() - start
+    counts = {key: count - counts[key] for key, count in profile_counts().items()}
+    counts['similar_max_depth'] = _profile_counts['similar_max_depth']
+    _profile_counts['similar_max_depth'] = max(max_depth, counts['similar_max_depth'])
+    return duration, counts
+
+def merge_profile_counts(counts):
+    """
+    Add the counters of a worker process (see run_group_job()) to the counters of this process
+    """
+    for key, count in counts.items():
+        if key == 'similar_max_depth':
+            _profile_counts[key] = max(_profile_counts[key], count)
+        elif key in _profile_counts:
+            _profile_counts[key] += count
+        else:
+            _diff_counts[key] += count
+
+def profile_counts():
+    """
+    Returns all counters of the hot paths, including the diff statistics (see diff_statistics())
+    """
+    return diff_statistics() | _profile_counts
+
+def profile_statistics():
+    """
+    Returns the counters of the hot paths (see profile_counts()), and for each function applied by map_groups() (e.g.,
+    'cluster_group'), the time, amount of registers and counters of each group
+    """
+    return {'counters': profile_counts(), 'groups': {name: dict(profiles) for name, profiles in _group_profiles.items()}}
+
+def reset_profile_statistics():
+    """
+    Reset the counters of the hot paths and the group profiles, the diff statistics are not reset
+    """
+    for key in _profile_counts:
+        _profile_counts[key] = 0
+    _group_profiles.clear()
+
+def simplify_group(group):
+    simplify_registers_list(group.registers)
+
+def clean_group(group):
+    group.description = clean_description(group.description)
+    clean_registers_list(group.registers)
+
+def cluster_group(group, cluster_ignore, engine, plan=None):
+    planned = None
+    if plan is not None:
+        planned = plan.get(group.name)
+        if planned is None:
+            print(f'Group {group.name} is not in the cluster plan, searching for clusters')
+    group.cluster_plan = {}
+    cluster_registers_list(group.name, group.registers, cluster_ignore, engine, group.cluster_plan, planned)
+
+def deduplicate_groups(groups):
+    """
+    Find groups with equal registers (e.g., with another group name for equal peripherals), of which only the first
+    group should define an interface. All subsequent equal groups get 'interface_group', the name of the first
+    group, whose interface they should use instead.
+    Registers only differing in their descriptions (see INTERFACE_IGNORED_KEYS) are equal, as these differ for the
+    generated clusters of each group (see cluster_registers_list()).
+    """
+    interface_groups = {}
+    for group in groups.values():
+        interface_group = interface_groups.setdefault(freeze_value(group.registers, INTERFACE_IGNORED_KEYS), group.name)
+        if interface_group != group.name:
+            print(f'Found group {group.name} with registers equal to group {interface_group}')
+            group.interface_group = interface_group
+
+def find_shared_groups(groups_list):
+    """
+    Find the groups which are equal in all of the given groups (results of group_peripherals() of multiple devices),
+    such that their interface can be shared between these devices.
+    Equal groups have equal names, descriptions and registers, where groups using the interface of another group (see
+    deduplicate_groups()) are never shared.
+    Returns the names of the shared groups, in the order of the first groups.
+    """
+    shared_groups = []
+    for name, group in groups_list[0].items():
+        if all(name in groups and groups[name].interface_group is None and groups[name].description == group.description and groups[name].registers == group.registers for groups in groups_list):
+            shared_groups.append(name)
+    return shared_groups
+
+def find_set_reset_registers(groups, rules):
+    """
+    Find the registers with a set/reset alias register (e.g., GPIO ODR and BSRR), in which writing a one to a bit sets
+    or resets the corresponding bit of the register, such that bits can be set and cleared with a single (atomic) write.
+    Each rule is a tuple (register name, alias register name, set shift, reset shift), where bit x of the register is set
+    by bit x + set shift of the alias, and reset by bit x + reset shift. The alias must be a write-only register of equal
+    size in the same registers (or cluster), of which the fields cover all aliased bits.
+    Each found register gets 'set_reset', a dictionary with the offset of the alias register (relative to the
+    register) and the set and reset shifts.
+    """
+    for group in groups.values():
+        find_set_reset_list(group.name, group.registers, rules)
+
+def find_set_reset_list(print_name, registers, rules):
+    registers_by_name = {}
+    for register in registers:
+        if isinstance(register, svd_model.Cluster):
+            find_set_reset_list(f'{print_name}.{register.name}', register.registers, rules)
+        else:
+            registers_by_name[register.name] = register
+
+    for name, alias_name, set_shift, reset_shift in rules:
+        register = registers_by_name.get(name)
+        alias = registers_by_name.get(alias_name)
+        if register is None or alias is None:
+            continue
+        register_mask = fields_mask(register.fields)
+        aliased_mask = (register_mask << set_shift) | (register_mask << reset_shift)
+        if register.access not in [None, 'read-write'] or alias.access != 'write-only' or alias.size != register.size or aliased_mask & ~fields_mask(alias.fields):
+            print(f'Rejected set/reset alias {print_name}.{alias_name} of register {name}')
+            continue
+        print(f'Found set/reset alias {print_name}.{alias_name} of register {name}')
+        register.set_reset = {'offset': alias.address_offset - register.address_offset, 'set_shift': set_shift, 'reset_shift': reset_shift}
+
+def find_bit_band_registers(groups, regions):
+    """
+    Find the groups of which all peripherals are located in a bit-band region, where each bit has an alias word, such
+    that single bits can be set and cleared with a single (atomic) write.
+    Each region is a tuple (base address, size, alias base address).
+    All registers (including those in clusters) of the found groups get 'bit_band', a dictionary with the base
+    address and alias base address of the region.
+    """
     for group in groups.values():
-        cluster_registers_list(group['name'], group['registers'], cluster_ignore)
+        size = registers_size(group.registers)
+        for base, region_size, alias_base in regions:
+            if all(base <= peripheral['base_address'] and peripheral['base_address'] + size <= base + region_size for peripheral in group.peripherals):
+                print(f'Found group {group.name} in bit-band region 0x{base:08X}')
+                set_bit_band(group.registers, {'base': base, 'alias': alias_base})
+                break
+
+def set_bit_band(registers, bit_band):
+    for register in registers:
+        if isinstance(register, svd_model.Cluster):
+            set_bit_band(register.registers, bit_band)
+        else:
+            register.bit_band = bit_band
+
+def fields_mask(fields):
+    """
+    Mask of all bits covered by the fields
+    """
+    return reduce(lambda mask, field: mask | (((1 << field.bit_width) - 1) << field.bit_offset), fields, 0)
+
+def registers_size(registers):
+    """
+    Amount of bytes spanned by the registers, including all elements of register and cluster arrays
+    """
+    size = 0
+    for register in registers:
+        item_size = registers_size(register.registers) if isinstance(register, svd_model.Cluster) else register.size // 8
+        size = max(size, register.address_offset + ((register.dim or 1) - 1) * (register.dim_increment or 0) + item_size)
+    return size
 
 def ungroup_peripherals(device, groups):
     """
@@ -81,12 +359,12 @@ def ungroup_peripherals(device, groups):
     """
     peripherals = []
     for group in groups.values():
-        for peripheral in group['peripherals']:
-            peripheral['registers'] = group['registers']
-            peripheral['description'] = group['description']
+        for peripheral in group.peripherals:
+            peripheral['registers'] = group.registers
+            peripheral['description'] = group.description
             peripherals.append(peripheral)
 
-    device['peripherals'] = peripherals
+    device.peripherals = peripherals
 
 def simplify_registers_list(registers):
     """
@@ -94,9 +372,9 @@ def simplify_registers_list(registers):
     """
     for idx, register in enumerate(registers):
         # All registers in can contain a 'meta_cluster', recursively replace the meta clusters by their registers
-        if 'meta_cluster' in register:
-            register = register['meta_cluster']
-            register['registers'] = simplify_registers_list(register['registers'])
+        if isinstance(register, svd_model.MetaCluster):
+            register = register.meta_cluster
+            register.registers = simplify_registers_list(register.registers)
             registers[idx] = register
 
     return registers
@@ -107,93 +385,165 @@ def clean_registers_list(registers):
     """
     # Strip newlines and duplicate whitespace characters from register and field descriptions
     for register in registers:
-        register['fields'].sort(key=lambda x: x['bit_offset'])
-        if register['description']:
-            register['description'] = ' '.join(list(filter(len, register['description'].split())))
-        for field in register['fields']:
-            field['description'] = ' '.join(list(filter(len, field['description'].split())))
+        register.fields.sort(key=lambda x: x.bit_offset)
+        if register.description:
+            register.description = ' '.join(list(filter(len, register.description.split())))
+        for field in register.fields:
+            field.description = ' '.join(list(filter(len, field.description.split())))
 
-    registers.sort(key=lambda x: x['address_offset'])
+    registers.sort(key=lambda x: x.address_offset)
 
 def clean_description(description):
     return ' '.join(list(filter(len, description.split())))
 
-def cluster_registers_list(print_name, registers, cluster_ignore):
+def cluster_registers_list(print_name, registers, cluster_ignore, engine='search', plan=None, planned=None):
     """
     Performs the cluster operations as defined in cluster_registers() based on a single list of registers
+    The runs found in each list of registers are recorded in the plan dictionary (if provided) by the print name of the
+    list, each with its properties (see CLUSTER_PLAN_RUN_KEYS), its first register and whether it was 'accepted' or
+    'rejected' (with the reason).
+    With a planned dictionary (a plan recorded before), its runs are applied instead of searching for runs, where runs
+    marked as rejected are never applied. Lists without planned runs are not clustered.
     """
     # Find all existing clusters within this list of registers, and recursively cluster, which reduces the search load
     for register in registers:
-        if 'registers' in register:
-            cluster_registers_list(f'{print_name}.{register['name']}', register['registers'], cluster_ignore)
+        if isinstance(register, svd_model.Cluster):
+            cluster_registers_list(f'{print_name}.{register.name}', register.registers, cluster_ignore, engine, plan, planned)
 
-    # Try to find new clusters
-    clusters = []
-    run_offset = 0
-    while run_offset < len(registers):
-        run_properties = find_run(registers, run_offset)
-        if run_properties is not None:
-            clusters.append(run_properties)
-            run_offset = run_offset + run_properties['length'] * run_properties['repeat']
-        else:
-            run_offset = run_offset + 1
+    # Apply the runs of the cluster plan if these still hold, otherwise try to find new clusters
+    clusters = None
+    if planned is not None:
+        clusters = check_planned_runs(registers, planned.get(print_name, []))
+        if clusters is None:
+            print(f'Clusters of the cluster plan no longer hold in {print_name}, searching for clusters')
+    if clusters is None:
+        clusters = []
+        signatures = signature_table(registers) if engine == 'signature' else None
+        run_offset = 0
+        while run_offset < len(registers):
+            if signatures is not None:
+                run_properties = find_run_signature(registers, run_offset, signatures)
+            else:
+                run_properties = find_run(registers, run_offset)
+            if run_properties is not None:
+                clusters.append(run_properties)
+                run_offset = run_offset + run_properties['length'] * run_properties['repeat']
+            else:
+                run_offset = run_offset + 1
 
     cluster_names = [cluster['name'] for cluster in clusters]
 
+    # Record the runs, the status of rejected runs is updated below
+    runs = [{key: cluster[key] for key in CLUSTER_PLAN_RUN_KEYS} | {'first_register': registers[cluster['offset']].name, 'status': 'accepted'} for cluster in clusters]
+    if plan is not None and runs:
+        plan[print_name] = runs
+
     # Replace all registers in clusters by their cluster component
     # In reverse order of offset, to maintain correct offset values even when registers are removed
-    for cluster in sorted(clusters, reverse=True, key=lambda x: x['offset']):
+    for cluster, run in sorted(zip(clusters, runs), reverse=True, key=lambda x: x[0]['offset']):
         # Ignore matching clusters
         if cluster_ignore.fullmatch(f'{print_name}.{cluster['name']}'):
             print(f'Rejecting ignored cluster in {print_name}.{cluster['name']}')
+            run.update({'status': 'rejected', 'reason': 'ignored'})
             continue
         # If multiple cluster items have duplicate cluster name, then they are invalid as they can't be addressed (and likely have overlapping registers as well)
         if cluster_names.count(cluster['name']) != 1:
-            print(f'Rejecting cluster in {print_name} with duplicate name {cluster['name']} starting at register {registers[cluster['offset']]['name']}')
+            print(f'Rejecting cluster in {print_name} with duplicate name {cluster['name']} starting at register {registers[cluster['offset']].name}')
+            run.update({'status': 'rejected', 'reason': 'duplicate name'})
+            continue
+        # Clusters rejected in the cluster plan are never applied
+        if cluster.get('plan_status') == 'rejected':
+            print(f'Rejecting cluster in {print_name}.{cluster['name']} as in the cluster plan')
+            run.update({'status': 'rejected', 'reason': 'cluster plan'})
             continue
         # If the cluster has registers with equal name, then it is invalid as no unique cluster registers can be generated
         if len(cluster['post']) > 1 and all(post == cluster['post'][0] for post in cluster['post']):
-            print(f'Rejecting cluster in {print_name} with non-unique registers {cluster['post']} starting at register {registers[cluster['offset']]['name']} ')
+            print(f'Rejecting cluster in {print_name} with non-unique registers {cluster['post']} starting at register {registers[cluster['offset']].name} ')
         # Extract the cluster registers
-        cluster_before = registers[0:cluster['offset']]
-        cluster_regs = registers[cluster['offset']:cluster['offset']+cluster['length']*cluster['repeat']]
-        cluster_after = registers[cluster['offset']+cluster['length']*cluster['repeat']:]
+        cluster_end = cluster['offset'] + cluster['length'] * cluster['repeat']
+        cluster_regs = registers[cluster['offset']:cluster_end]
         # Create cluster with properties
-        cluster_address_offset = cluster_regs[0]['address_offset']
+        cluster_address_offset = cluster_regs[0].address_offset
         # The description of each register in the cluster is a combination of all descriptions in that repeat. Take all common parts, and place the differentiating parts between [] divided by |.
         cluster_contents = []
         for idx in range(0, cluster['length']):
-            cluster_description_overlap = find_string_overlap([x['description'] for x in cluster_regs[idx::cluster['length']] if x['description']])
+            cluster_description_overlap = find_string_overlap([x.description for x in cluster_regs[idx::cluster['length']] if x.description])
             cluster_description = ""
             for part in range(0, len(cluster_description_overlap)):
                 if part % 2 == 0:
                     cluster_description += cluster_description_overlap[part]
                 else:
                     cluster_description += '[' + '|'.join(cluster_description_overlap[part]) + ']'
-            cluster_contents.append(
-                cluster_regs[idx] |
-                {
-                    'name': cluster['post'][idx],
-                    'description': cluster_description,
-                    'address_offset': cluster_regs[idx]['address_offset'] - cluster_address_offset,
-                }
-            )
+            cluster_contents.append(dataclasses.replace(
+                cluster_regs[idx],
+                name=cluster['post'][idx],
+                description=cluster_description,
+                address_offset=cluster_regs[idx].address_offset - cluster_address_offset,
+            ))
         cluster_name = cluster['name'] + '[%s]'
-        print(f'Found valid cluster {print_name}.{cluster['name']} of length {cluster['length']}, repeat {cluster['repeat']}, with increment {hex(cluster['increment'])} and index {cluster['index']}, starting at register {registers[cluster['offset']]['name']}')
+        print(f'Found valid cluster {print_name}.{cluster['name']} of length {cluster['length']}, repeat {cluster['repeat']}, with increment {hex(cluster['increment'])} and index {cluster['index']}, starting at register {registers[cluster['offset']].name}')
         # Recursively cluster the registers in this cluster as well
-        cluster_registers_list(f'{print_name}.{cluster_name}', cluster_contents, cluster_ignore)
-        cluster_item = {
-            'dim': cluster['repeat'],
-            'dim_increment': cluster['increment'],
-            'dim_index': cluster['index'],
-            'name': cluster_name,
-            'description': f'Cluster {print_name}.{cluster_name} generated by svd2cpp, array index by {cluster['index']}',
-            'address_offset': cluster_address_offset,
-            'size': cluster['repeat'] * cluster['increment'] * 8,
-            'registers': cluster_contents
-        }
-        # Replace registers by cluster
-        registers[:] = cluster_before + [cluster_item] + cluster_after
+        cluster_registers_list(f'{print_name}.{cluster_name}', cluster_contents, cluster_ignore, engine, plan, planned)
+        cluster_item = svd_model.Cluster(
+            dim=cluster['repeat'],
+            dim_increment=cluster['increment'],
+            dim_index=cluster['index'],
+            name=cluster_name,
+            description=f'Cluster {print_name}.{cluster_name} generated by svd2cpp, array index by {cluster['index']}',
+            address_offset=cluster_address_offset,
+            size=cluster['repeat'] * cluster['increment'] * 8,
+            registers=cluster_contents,
+        )
+        # Replace registers by cluster, in place
+        registers[cluster['offset']:cluster_end] = [cluster_item]
+
+def check_planned_runs(registers, runs):
+    """
+    Check that the runs of a cluster plan (see cluster_registers_list()) still hold for the registers with equal
+    properties (see check_run()), without searching for any other runs.
+    Returns the run properties with the status of the plan as 'plan_status', or None if any of the runs no longer holds
+    """
+    clusters = []
+    run_end = 0
+    for run in runs:
+        if run['offset'] < run_end or run['offset'] + run['length'] * run['repeat'] > len(registers):
+            return None
+        run_properties = check_run(registers, run['offset'], run['length'], run['repeat'])
+        if run_properties is None or any(run_properties[key] != run[key] for key in CLUSTER_PLAN_RUN_KEYS):
+            return None
+        clusters.append(run_properties | {'plan_status': run.get('status', 'accepted')})
+        run_end = run['offset'] + run['length'] * run['repeat']
+    return clusters
+
+def compare_cluster_plan(plan, groups):
+    """
+    Compare a cluster plan (the 'cluster_plan' of each group, by group name) with the runs recorded by the clustered
+    groups (see cluster_registers()), to find where the SVD file has drifted from the plan.
+    Returns a description of each difference, in order of the groups
+    """
+    differences = []
+    for name in list(groups) + [name for name in plan if name not in groups]:
+        if name not in plan:
+            differences.append(f'Group {name} is not in the cluster plan')
+            continue
+        if name not in groups:
+            differences.append(f'Group {name} of the cluster plan is not in the device')
+            continue
+        planned = plan[name]
+        found = groups[name].cluster_plan or {}
+        for print_name in list(found) + [print_name for print_name in planned if print_name not in found]:
+            planned_runs = {(run['name'], run['offset']): run for run in planned.get(print_name, [])}
+            found_runs = {(run['name'], run['offset']): run for run in found.get(print_name, [])}
+            for key in list(found_runs) + [key for key in planned_runs if key not in found_runs]:
+                if key not in planned_runs:
+                    differences.append(f'Found cluster {print_name}.{key[0]} starting at register {found_runs[key]['first_register']}, which is not in the cluster plan')
+                elif key not in found_runs:
+                    differences.append(f'Cluster {print_name}.{key[0]} of the cluster plan starting at register {planned_runs[key]['first_register']} is no longer found')
+                else:
+                    for prop in CLUSTER_PLAN_RUN_KEYS + ['first_register', 'status']:
+                        if found_runs[key].get(prop) != planned_runs[key].get(prop):
+                            differences.append(f'Cluster {print_name}.{key[0]} has {prop} {found_runs[key].get(prop)}, instead of {planned_runs[key].get(prop)} in the cluster plan')
+    return differences
 
 def find_run(registers, run_offset):
     # The run properties are:
@@ -206,50 +556,205 @@ def find_run(registers, run_offset):
     # Start trying with the highest possible run repeat, which is the remaining registers divided by the run length (i.e., the run repeats as many times as possible), and at least 2 times
     for run_length in range((len(registers) - run_offset) // 2, 0, -1):
         for run_repeat in range((len(registers) - run_offset) // run_length, 1, -1):
-            run_regs = registers[run_offset:(run_offset + run_length * run_repeat)]
-
-            # A run of registers consists of a run name, followed by a digit
-            # Make sure all registers have a matching string part up to a digit that may resemble the run name
-            # Note that the run name may contain a digit as well, so this function does not actually calculate the run name, but is just to prevent a more expensive calculation
-            start_string = None
-            for i, c in enumerate(run_regs[0]['name']):
-                if c.isdigit():
-                    # This is the first digit, we have a start match if all registers in the run start with this same string
-                    start_string = run_regs[0]['name'][0:i]
-                    for reg in run_regs:
-                        if not reg['name'].startswith(start_string):
-                            start_string = None
-                            break
-                    break
-            if not start_string:
-                continue
-
-            # Check if each of the registers in the run repeats 'run_repeat' amount of times and the jump for each repeat is the same
-            # Additionally, the 'index' used must be equal for all registers
-            run_name = None
-            run_repeat_index = None
-            run_repeat_post = [None] * run_length
-            run_jump = None
-            for run_idx in range(0, run_length):
-                run_repeat_regs = [None] * run_repeat
-                for repeat_idx in range(0, run_repeat):
-                    run_repeat_regs[repeat_idx] = registers[run_offset + repeat_idx * run_length + run_idx]
-                run_props = check_registers_repeat(run_repeat_regs, run_name, run_repeat_index, run_repeat_post[run_idx], run_jump)
-                if run_props is None:
-                    # These registers are not part of a run
+            run_properties = check_run(registers, run_offset, run_length, run_repeat)
+            if run_properties is not None:
+                return run_properties
+    return None
+
+def find_run_signature(registers, run_offset, signatures):
+    """
+    Find the same run as find_run(), without trying every (run_length, run_repeat) pair.
+    Registers can only be similar if their signatures are equal (see item_signature()), so a run of length x can only
+    repeat for as long as the signature of each register equals the signature x registers further.
+    Only the run lengths for which the first register has an equal signature x registers further are tried, and the
+    common prefix of the signatures at the run offset and x registers further (see signature_common_length()) limits
+    the run repeat to try. The signature table (see signature_table()) is calculated once for the list of registers.
+    The remaining pairs are tried in the same order as find_run(), so the resulting run is equal.
+    """
+    remaining = len(registers) - run_offset
+    run_lengths = []
+    idx = signatures['next_equal'][run_offset]
+    while idx is not None and idx - run_offset <= remaining // 2:
+        run_lengths.append(idx - run_offset)
+        idx = signatures['next_equal'][idx]
+    for run_length in reversed(run_lengths):
+        common_length = signature_common_length(signatures, run_offset, run_offset + run_length)
+        max_repeat = min(remaining // run_length, common_length // run_length + 1)
+        for run_repeat in range(max_repeat, 1, -1):
+            run_properties = check_run(registers, run_offset, run_length, run_repeat)
+            if run_properties is not None:
+                return run_properties
+    return None
+
+def check_run(registers, run_offset, run_length, run_repeat):
+    """
+    Check if the run of 'run_length' registers starting at 'run_offset' repeats 'run_repeat' times.
+    Returns the run properties (see find_run()) if it does, or None otherwise.
+    """
+    _profile_counts['run_candidates'] += 1
+    run_regs = registers[run_offset:(run_offset + run_length * run_repeat)]
+
+    # A run of registers consists of a run name, followed by a digit
+    # Make sure all registers have a matching string part up to a digit that may resemble the run name
+    # Note that the run name may contain a digit as well, so this function does not actually calculate the run name, but is just to prevent a more expensive calculation
+    start_string = None
+    for i, c in enumerate(run_regs[0].name):
+        if c.isdigit():
+            # This is the first digit, we have a start match if all registers in the run start with this same string
+            start_string = run_regs[0].name[0:i]
+            for reg in run_regs:
+                if not reg.name.startswith(start_string):
+                    start_string = None
                     break
-                run_name, run_repeat_index, run_repeat_post[run_idx], run_jump = run_props
-            if (run_length == 0) or (run_props is None):
-                continue
+            break
+    if not start_string:
+        return None
 
-            # Make sure run_name does not yet exist in this peripheral, otherwise a name clash would occur
-            if run_name in [x['name'] for x in registers]:
-                print(f'Potential run {run_name} clashes with register name, skipping')
-                continue
+    # Check if each of the registers in the run repeats 'run_repeat' amount of times and the jump for each repeat is the same
+    # Additionally, the 'index' used must be equal for all registers
+    run_name = None
+    run_repeat_index = None
+    run_repeat_post = [None] * run_length
+    run_jump = None
+    for run_idx in range(0, run_length):
+        run_repeat_regs = [None] * run_repeat
+        for repeat_idx in range(0, run_repeat):
+            run_repeat_regs[repeat_idx] = registers[run_offset + repeat_idx * run_length + run_idx]
+        run_props = check_registers_repeat(run_repeat_regs, run_name, run_repeat_index, run_repeat_post[run_idx], run_jump)
+        _profile_counts['repeat_checks'] += 1
+        if run_props is None:
+            _profile_counts['repeat_rejections'] += 1
+            # These registers are not part of a run
+            break
+        run_name, run_repeat_index, run_repeat_post[run_idx], run_jump = run_props
+    if (run_length == 0) or (run_props is None):
+        return None
 
-            # We found a valid run!
-            return {'offset': run_offset, 'name': run_name, 'index': run_repeat_index, 'increment': run_jump, 'length': run_length, 'repeat': run_repeat, 'post': run_repeat_post}
-    return None
+    # Make sure run_name does not yet exist in this peripheral, otherwise a name clash would occur
+    if run_name in [x.name for x in registers]:
+        print(f'Potential run {run_name} clashes with register name, skipping')
+        return None
+
+    # We found a valid run!
+    return {'offset': run_offset, 'name': run_name, 'index': run_repeat_index, 'increment': run_jump, 'length': run_length, 'repeat': run_repeat, 'post': run_repeat_post}
+
+def signature_table(registers):
+    """
+    Calculate the signature table of a list of registers, which find_run_signature() uses for each run offset:
+     * ids: for each register an integer, registers with equal fingerprints (see item_fingerprint()) get equal integers
+     * next_equal: for each register, the index of the next register with an equal id, or None
+     * hashes: the polynomial hash of the ids before each index, see signature_common_length()
+     * powers: the powers of SIGNATURE_HASH_BASE, up to the amount of registers
+    """
+    fingerprint_ids = {}
+    ids = [fingerprint_ids.setdefault(item_fingerprint(register), len(fingerprint_ids)) for register in registers]
+    next_equal = [None] * len(ids)
+    last_index = {}
+    for idx in range(len(ids) - 1, -1, -1):
+        next_equal[idx] = last_index.get(ids[idx])
+        last_index[ids[idx]] = idx
+    hashes = [0]
+    powers = [1]
+    for signature_id in ids:
+        hashes.append((hashes[-1] * SIGNATURE_HASH_BASE + signature_id + 1) % SIGNATURE_HASH_MODULUS)
+        powers.append(powers[-1] * SIGNATURE_HASH_BASE % SIGNATURE_HASH_MODULUS)
+    return {'ids': ids, 'next_equal': next_equal, 'hashes': hashes, 'powers': powers}
+
+def signature_common_length(signatures, first, second):
+    """
+    Length of the common prefix of the signature ids starting at the first and second index (first < second), found by
+    a binary search on the hashes of the signature table (see signature_table()).
+    Equal ids always have equal hashes, so the length is never too short, and only a hash collision may result in a
+    longer length, which only results in trying more run repeats.
+    """
+    hashes, powers = signatures['hashes'], signatures['powers']
+    low, high = 0, len(signatures['ids']) - second
+    while low < high:
+        length = (low + high + 1) // 2
+        first_hash = (hashes[first + length] - hashes[first] * powers[length]) % SIGNATURE_HASH_MODULUS
+        second_hash = (hashes[second + length] - hashes[second] * powers[length]) % SIGNATURE_HASH_MODULUS
+        if first_hash == second_hash:
+            low = length
+        else:
+            high = length - 1
+    return low
+
+def item_signature(item):
+    """
+    Create a hashable signature of a register, field or cluster, containing all properties compared by check_items_similar().
+    Items that are similar always have equal signatures, so items with different signatures are never similar.
+    The name of the item itself is not part of the signature, as registers are compared loose.
+    Sub items are included by their fingerprint (see item_fingerprint()), and fields additionally by their name with all
+    digit runs abstracted, as fields are not compared loose and only digits may differ.
+    Note that register names are not abstracted, as the run index (see check_registers_repeat()) may contain other characters.
+    """
+    values, list_keys = similar_keys(type(item))
+    signature = [type(item), freeze_value(values(item))]
+    for name in list_keys:
+        value = getattr(item, name)
+        if name == 'fields':
+            # Empty lists and None compare equal
+            signature.append(tuple((item_fingerprint(subval), abstract_name(subval.name)) for subval in value) if value else ())
+        else:
+            signature.append(tuple(item_fingerprint(subval) for subval in value) if value else ())
+    return tuple(signature)
+
+@lru_cache(maxsize=None)
+def similar_keys(item_type):
+    """
+    Split the properties of a register, field or cluster class (see svd_model) by how check_items_similar() compares them.
+    Returns a function getting the tuple of values that must be equal (SIMILAR_VALUE_KEYS, except the name), and the
+    properties with lists of items that must be recursively similar (SIMILAR_LIST_KEYS)
+    """
+    for name in item_type.__slots__:
+        if name not in SIMILAR_IGNORED_KEYS + SIMILAR_VALUE_KEYS + SIMILAR_LIST_KEYS:
+            raise Exception(f'Unknown key in comparison {name}')
+    value_keys = [name for name in item_type.__slots__ if name in SIMILAR_VALUE_KEYS and name != 'name']
+    list_keys = tuple(name for name in item_type.__slots__ if name in SIMILAR_LIST_KEYS)
+    return operator.attrgetter(*value_keys), list_keys
+
+def item_fingerprint(item):
+    """
+    Get the structural hash of the signature of a register, field or cluster (see item_signature()).
+    The fingerprint is calculated once for each item, and reused by the fingerprint of each item containing it.
+    Clustering never changes an item in place: the lists of existing clusters are clustered before their cluster is
+    compared, and a run of registers is replaced by a new cluster (see cluster_registers_list()), so the fingerprints
+    remain valid while clustering.
+    """
+    fingerprint = _fingerprints.get(id(item))
+    # The item itself is stored with the fingerprint, to make sure its id has not been reused
+    if fingerprint is None or fingerprint[0] is not item:
+        fingerprint = (item, hash(item_signature(item)))
+        _fingerprints[id(item)] = fingerprint
+    return fingerprint[1]
+
+def invalidate_fingerprints():
+    """
+    Remove all calculated fingerprints, which must be done whenever registers may have been modified in place (e.g.,
+    by the stages before clustering, or by find_set_reset_registers() after it)
+    As fingerprints contain the fingerprints of their sub items, any modification may invalidate the fingerprint of
+    a parent item, so all fingerprints are removed.
+    """
+    _fingerprints.clear()
+
+def abstract_name(name):
+    """
+    Replace all digit runs in a name by '#', names that only differ in their digits result in the same abstract name
+    """
+    return _digit_runs.sub('#', name) if name else name
+
+def freeze_value(value, ignored_keys=()):
+    """
+    Convert a (nested) value from the device model into a hashable value, leaving out the properties with the ignored
+    keys at any level
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_value(x, ignored_keys) for x in value)
+    if isinstance(value, dict):
+        return tuple((key, freeze_value(x, ignored_keys)) for key, x in sorted(value.items()) if key not in ignored_keys)
+    if isinstance(value, svd_model.ITEM_TYPES):
+        return (type(value).__name__,) + tuple(freeze_value(getattr(value, name), ignored_keys) for name in value.__slots__ if name not in ignored_keys)
+    return value
 
 def check_registers_repeat(run_repeat_regs, run_name, repeat_index, repeat_post, run_jump):
     """
@@ -257,7 +762,7 @@ def check_registers_repeat(run_repeat_regs, run_name, repeat_index, repeat_post,
     """
     if len(run_repeat_regs) < 2:
         raise ValueError('At least two registers must be provided')
-    overlap = find_string_overlap([reg['name'] for reg in run_repeat_regs])
+    overlap = find_string_overlap([reg.name for reg in run_repeat_regs])
     try:
         # At least one part and at most two parts must be overlapping, and one part differentiating, and the first overlapping part must match the run name
         name = overlap[0]
@@ -275,8 +780,8 @@ def check_registers_repeat(run_repeat_regs, run_name, repeat_index, repeat_post,
             if (repeat_post is not None) and (repeat_post != post):
                 return None
         # The jump in register address must be equal for all registers
-        jump = run_repeat_regs[1]['address_offset'] - run_repeat_regs[0]['address_offset']
-        if ((run_jump is not None) and (jump != run_jump)) or not reduce(lambda x, y: y if ((x != False) and ((y['address_offset'] - x['address_offset']) == jump)) else False, run_repeat_regs):
+        jump = run_repeat_regs[1].address_offset - run_repeat_regs[0].address_offset
+        if ((run_jump is not None) and (jump != run_jump)) or not reduce(lambda x, y: y if ((x != False) and ((y.address_offset - x.address_offset) == jump)) else False, run_repeat_regs):
             return None
         # All sets of registers must be similar
         if not reduce(lambda x, y: y if ((x != False) and check_items_similar(x, y)) else False, run_repeat_regs):
@@ -288,49 +793,48 @@ def check_registers_repeat(run_repeat_regs, run_name, repeat_index, repeat_post,
         pass
     return None
 
-def check_items_similar(items1, items2, loose = True):
+def check_items_similar(items1, items2, loose = True, depth = 1):
     """
-    Check if the items of two dicts are similar, which is the case if they differ only in name, description, and address
+    Check if two registers, fields or clusters are similar, which is the case if they differ only in name, description,
+    and address
     The check is recursive, and applied to the registers in a peripheral and the fields in a register as well
+    Items with different fingerprints are never similar, items with equal fingerprints are compared in full to confirm
     """
-    if items1.keys() != items2.keys():
-        return False # Keys don't match, they are not similar
-    for name, value in items1.items():
-        if name == 'name':
-            if loose: # Value may differ, ignore
-                continue
-            else: # Value must match except for an integer
-                overlap = find_string_overlap([items1['name'], items2['name']])
-                if (len(overlap) > 3) or ((len(overlap) != 1) and not (overlap[1][0].isdigit() and overlap[1][1].isdigit())):
-                    return False # Difference is more than a digit, no match
-                continue
-        elif name in ['display_name', 'description', 'address_offset', 'enumerated_values', 'header_struct_name']:
-            continue # Value may differ, ignore
-        elif name in ['name', 'size', 'access', 'protection', 'reset_value', 'reset_mask', 'dim', 'dim_increment', 'dim_index', 'dim_name', 'dim_array_index', 'alternate_group', 'alternate_register', 'data_type', 'modified_write_values', 'write_constraint', 'read_action', 'derived_from', 'bit_offset', 'bit_width', 'lsb', 'msb', 'bit_range', 'alternate_cluster']:
-            if value != items2[name]:
-                # print(f'Found mismatch for key {name}')
-                return False # Values don't match, they are not similar
-        elif name in ['registers', 'fields', 'clusters']:
-            if not value and not items2[name]:
-                continue  # Two empty lists, no need to check further
-            if len(value) != len(items2[name]):
-                # print(f'Found mismatching length for key {name}')
-                return False # Items have different lengths, never similar
-            for subidx, subval in enumerate(value):
-                if not check_items_similar(subval, items2[name][subidx], loose=(name != 'fields')):
-                    # print(f'Found mismatch for key {name} at index {subidx}')
-                    return False # Items are not recursively similar, then these are not similar
-            # TODO: if the fields of the second item are all contained in the fields of the first, then it is OK?
-            # TODO: Check if for all fields in the second items, a similar field is contained in the first
-            # for _, subval2 in enumerate(items2[name]):
-            #     for _, subval1 in enumerate(value):
-            #         if check_items_similar(subval1, subval2, loose=True):
-            #             break
-            #     else:
-            #         # print(f'Found mismatch for key {name}')
-            #         return False # Items are not recursively similar, then these are not similar
-        else:
-            raise Exception(f'Unknown key in comparison {name}')
+    _profile_counts['similar_checks'] += 1
+    if depth > _profile_counts['similar_max_depth']:
+        _profile_counts['similar_max_depth'] = depth
+    if item_fingerprint(items1) != item_fingerprint(items2):
+        return False # Structure doesn't match, they are not similar
+    if type(items1) is not type(items2):
+        return False # Types don't match, they are not similar
+    values, list_keys = similar_keys(type(items1))
+    if values(items1) != values(items2):
+        return False # Values don't match, they are not similar
+    if not loose: # Name must match except for an integer, otherwise the name may differ
+        overlap = find_string_overlap([items1.name, items2.name])
+        if (len(overlap) > 3) or ((len(overlap) != 1) and not (overlap[1][0].isdigit() and overlap[1][1].isdigit())):
+            return False # Difference is more than a digit, no match
+    for name in list_keys:
+        value = getattr(items1, name)
+        value2 = getattr(items2, name)
+        if not value and not value2:
+            continue  # Two empty lists, no need to check further
+        if len(value) != len(value2):
+            # print(f'Found mismatching length for key {name}')
+            return False # Items have different lengths, never similar
+        for subidx, subval in enumerate(value):
+            if not check_items_similar(subval, value2[subidx], loose=(name != 'fields'), depth=depth + 1):
+                # print(f'Found mismatch for key {name} at index {subidx}')
+                return False # Items are not recursively similar, then these are not similar
+        # TODO: if the fields of the second item are all contained in the fields of the first, then it is OK?
+        # TODO: Check if for all fields in the second items, a similar field is contained in the first
+        # for _, subval2 in enumerate(value2):
+        #     for _, subval1 in enumerate(value):
+        #         if check_items_similar(subval1, subval2, loose=True):
+        #             break
+        #     else:
+        #         # print(f'Found mismatch for key {name}')
+        #         return False # Items are not recursively similar, then these are not similar
     return True
 
 def find_string_overlap(input : list[str], start_only = False):
@@ -341,9 +845,11 @@ def find_string_overlap(input : list[str], start_only = False):
     All uneven indices in the list are differentiating parts, and of type 'list(str, ...)', where the first item
     corresponds to additional characters in str1, the second item corresponds to additional characters in str2, etc.
     """
+    _profile_counts['overlap_calls'] += 1
+    _profile_counts['overlap_input_length'] += sum(map(len, input))
     ndiffs = []
     for idx in range(1, len(input)):
-        ndiffs.append(_dmp.diff_main(input[0], input[idx]))
+        ndiffs.append(diff_strings(input[0], input[idx]))
 
     result = []
     # Then loop over all diffs to gather overlapping and differentiating parts
@@ -410,3 +916,65 @@ def find_string_overlap(input : list[str], start_only = False):
                 diff_res[idx + 1] = diffn
             result.append(diff_res)
     return result
+
+def diff_strings(text1, text2):
+    """
+    Computes the same diff as diff_match_patch.diff_main(), as a list of (operation, text) tuples.
+    Names of repeating registers (e.g., 'S3CR' and 'S4CR') and fields only differ in a single part, usually a digit run.
+    After removing the common prefix and suffix, these differing middle parts have no characters in common, for which the
+    diff is known to be a deletion of the first and an insertion of the second part, so no general diff is required.
+    Note that the digit runs themselves are not used as tokens, as a diff of 'S10CR' and 'S11CR' has overlap 'S1'.
+    All other strings are passed to the general diff, of which the results are memoized.
+    """
+    if text1 == text2:
+        _diff_counts['fast'] += 1
+        return [(0, text1)] if text1 else []
+    dmp = _dmp or load_dmp()
+    prefix_len = dmp.diff_commonPrefix(text1, text2)
+    suffix_len = dmp.diff_commonSuffix(text1[prefix_len:], text2[prefix_len:])
+    middle1 = text1[prefix_len:len(text1) - suffix_len]
+    middle2 = text2[prefix_len:len(text2) - suffix_len]
+    if middle1 and middle2 and not set(middle1).isdisjoint(middle2):
+        _diff_counts['general'] += 1
+        return list(diff_main_cached(text1, text2))
+
+    _diff_counts['fast'] += 1
+    diffs = []
+    if prefix_len:
+        diffs.append((0, text1[:prefix_len]))
+    if middle1:
+        diffs.append((-1, middle1))
+    if middle2:
+        diffs.append((1, middle2))
+    if suffix_len:
+        diffs.append((0, text1[len(text1) - suffix_len:]))
+    # Apply the same cleanup as diff_main() to result in exactly the same diff
+    dmp.diff_cleanupMerge(diffs)
+    return diffs
+
+@lru_cache(maxsize=4096)
+def diff_main_cached(text1, text2):
+    """
+    Memoized diff_match_patch.diff_main(), the diff is returned as tuple as find_string_overlap() modifies its diffs
+    """
+    _profile_counts['diff_main_calls'] += 1
+    _profile_counts['diff_main_input_length'] += len(text1) + len(text2)
+    return tuple((_dmp or load_dmp()).diff_main(text1, text2))
+
+def load_dmp():
+    """
+    Import diff_match_patch and create the instance used by all diffs, which is deferred until the first diff, such that
+    the stages before clustering (and a conversion which is skipped) do not pay for the import
+    """
+    global _dmp
+    from diff_match_patch import diff_match_patch
+    _dmp = diff_match_patch()
+    return _dmp
+
+def diff_statistics():
+    """
+    Returns the amount of string diffs resolved by the fast path and the general path of diff_strings(), and the
+    amount of hits and misses of the general path memo
+    """
+    cache_info = diff_main_cached.cache_info()
+    return _diff_counts | {'hits': _diff_counts['hits'] + cache_info.hits, 'misses': _diff_counts['misses'] + cache_info.misses}
@@ -0,0 +1,328 @@
+"""
+Benchmark the C++ code generated by svd2cpp for the bundled SVD files with the host compiler, to find out whether a
+change to the templates makes the generated headers slower to compile, or the emitted code larger.
+For each SVD file, the files are generated (with split groups) into a temporary directory, and:
+ * header: a source file only including the device header is checked for syntax (i.e., parsed, and the class templates
+   that the header uses are instantiated), recording the wall time, the peak memory of the compiler and the phases of
+   its time report (-ftime-report, GCC only)
+ * samples: a source file with sample access functions (see SAMPLES) is compiled to assembly, recording the
+   instructions of each function, and the amount of instantiated functions, i.e., the inline and template functions
+   which are emitted when compiling without optimization. For an Arm target, the samples are also compiled into an
+   object file, recording the code size of each function (the inline assembly in the headers is Arm only).
+The samples only use peripherals and fields which exist in all bundled SVD files, use --no_samples for other SVD files.
+By default the host compiler is used, of which the instructions differ from a Cortex-M target, but any change in the
+emitted code shows all the same. A cross compiler can be selected with --compiler and --cxx_flags, e.g.:
+    uv run svd_codegen_benchmark.py --compiler arm-none-eabi-g++ --cxx_flags "-std=c++20 -O2 -mcpu=cortex-m7 -mthumb"
+
+The results are stored as JSON, and can be compared to a stored baseline, in which case every header that became
+slower to compile or used more memory than the tolerance, and every sample which has more instructions, a larger size
+or more instantiated functions is reported as regression:
+    uv run svd_codegen_benchmark.py --output baseline.json
+    uv run svd_codegen_benchmark.py --compare baseline.json
+"""
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+import svd2cpp
+from svd_benchmark import DEFAULT_SVD_FILES
+
+# Increment whenever the stored results change
+BENCHMARK_FORMAT = 1
+DEFAULT_COMPILER = 'g++'
+DEFAULT_CXX_FLAGS = '-std=c++20 -O2'
+# Groups of which the headers are included by the samples
+SAMPLE_GROUPS = ['gpio', 'i2c', 'tim']
+# Sample access functions by name, each compiled as extern "C" function with this name
+SAMPLES = {
+    'field_set': 'void field_set() { I2C1_IFC.CR1.PE().set(); }',
+    'field_clr': 'void field_clr() { I2C1_IFC.CR1.PE().clr(); }',
+    'field_get': 'std::uint32_t field_get() { return I2C1_IFC.CR2.NBYTES(); }',
+    'rmw_chain': 'void rmw_chain(std::uint8_t length) { I2C1_IFC.CR2.read().NBYTES(length).RD_WRN().clr().START().set().write(); }',
+    'atomic_set': 'void atomic_set(std::uint32_t mask) { GPIOA_IFC.ODR.set(mask); }',
+    'atomic_clr': 'void atomic_clr(std::uint32_t mask) { GPIOA_IFC.ODR.clr(mask); }',
+    'cluster_write': 'void cluster_write(unsigned channel, std::uint32_t value) { TIM2_IFC.CCR[channel].write(value); }',
+    'cluster_rmw': 'void cluster_rmw(unsigned channel, std::uint16_t value) { TIM2_IFC.CCR[channel].read().CCR1(value).write(); }',
+    'cluster_constant': 'void cluster_constant(std::uint16_t value) { TIM2_IFC.CCR[2].read().CCR1(value).write(); }',
+}
+# Differences below these are considered noise, and never reported as regression
+MIN_TIME_DIFFERENCE = 0.05
+MIN_MEMORY_DIFFERENCE = 1024 * 1024
+
+# The name of the device, which is the first name in the SVD file
+_device_name = re.compile(rb'<device\b.*?<name>\s*([^<]*?)\s*</name>', re.DOTALL)
+# Entry of the GCC time report: name, user, system and wall time (with optional percentages), and optional memory
+_time_report_entry = re.compile(r'^ (\S.*?)\s*:\s*([\d.]+)\s*(?:\(\s*\d+%\))?\s*([\d.]+)\s*(?:\(\s*\d+%\))?\s*([\d.]+)\s*(?:\(\s*\d+%\))?\s*(?:(\d+)([kMG]?)\b)?')
+_memory_units = {'': 1, 'k': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def device_name(svd_file):
+    """
+    Name of the device in the SVD file, which is the prefix of the generated headers
+    """
+    with open(svd_file, 'rb') as file:
+        match = _device_name.search(file.read())
+    if match is None:
+        raise ValueError(f'No device name found in {svd_file}')
+    return match.group(1).decode().lower()
+
+def run_compiler(command):
+    """
+    Run the compiler command, returns its output (stdout and stderr), the wall time and its peak memory, i.e., the peak
+    resident memory of the compiler driver or any of the processes it started
+    """
+    with tempfile.TemporaryFile() as output:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=output, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+        duration = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        output.seek(0)
+        text = output.read().decode(errors='replace')
+    if process.returncode != 0:
+        raise RuntimeError(f'{shlex.join(command)} failed with exit code {process.returncode}:\n{text}')
+    return text, duration, usage.ru_maxrss * 1024
+
+def parse_time_report(text):
+    """
+    Parse the time report in the compiler output (GCC only), returns a dictionary with the wall time and the memory (if
+    reported) of each entry, or an empty dictionary if there is no time report
+    """
+    report = {}
+    for line in text.splitlines():
+        match = _time_report_entry.match(line)
+        if match:
+            name, _, _, wall, memory, unit = match.groups()
+            report[name] = {'wall': float(wall), 'memory': int(memory) * _memory_units[unit] if memory else None}
+    return report
+
+def count_instructions(assembly, names):
+    """
+    Count the instructions of each of the named functions in the assembly, i.e., the lines between the label of the
+    function and the end of the function which are no directives, labels or comments
+    """
+    counts = {}
+    current = None
+    for line in assembly.splitlines():
+        line = line.strip()
+        if not line or line[0] in '#@;':
+            continue
+        if line.endswith(':'):
+            if line[:-1] in names:
+                current = line[:-1]
+                counts[current] = 0
+            continue
+        if line.startswith('.'):
+            if current is not None and (line.startswith('.size') or line.startswith('.cfi_endproc')):
+                current = None
+            continue
+        if current is not None:
+            counts[current] += 1
+    return counts
+
+def count_instantiated_functions(assembly):
+    """
+    Count the weak symbols in the assembly, which are the inline and template functions emitted out-of-line
+    """
+    return len({line.split()[1] for line in assembly.splitlines() if line.strip().startswith('.weak')})
+
+def section_sizes(size_tool, object_file):
+    """
+    Size of each section in the object file, using the size tool in System V format
+    """
+    output = subprocess.run([size_tool, '-A', object_file], capture_output=True, text=True, check=True).stdout
+    sizes = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and parts[1].isdigit():
+            sizes[parts[0]] = int(parts[1])
+    return sizes
+
+def default_size_tool(compiler):
+    """
+    The size tool belonging to the compiler, e.g., arm-none-eabi-size for arm-none-eabi-g++
+    """
+    for suffix in ['g++', 'c++', 'clang++']:
+        if compiler.endswith(suffix):
+            return compiler.removesuffix(suffix) + 'size'
+    return 'size'
+
+def targets_arm(compiler, cxx_flags):
+    """
+    Whether the compiler emits code for an Arm target, which is required to assemble the inline assembly of the generated
+    headers
+    """
+    machine = subprocess.run([compiler, *cxx_flags, '-dumpmachine'], capture_output=True, text=True, check=True).stdout
+    return machine.startswith(('arm', 'aarch64'))
+
+def benchmark_header(compiler, cxx_flags, generate_dir, name, repeat=1):
+    """
+    Check the syntax of a source file including the device header, using the fastest run of the repeated runs, returns
+    the time, the peak memory and the time report
+    """
+    source_file = os.path.join(generate_dir, 'benchmark_header.cpp')
+    with open(source_file, 'w') as file:
+        file.write(f'#include "{name}-regifc.hpp"\n')
+    runs = [run_compiler([compiler, *cxx_flags, '-I', generate_dir, '-fsyntax-only', '-ftime-report', source_file]) for _ in range(repeat)]
+    text, duration, peak_memory = min(runs, key=lambda run: run[1])
+    return {'time': duration, 'peak_memory': peak_memory, 'time_report': parse_time_report(text)}
+
+def benchmark_samples(compiler, cxx_flags, size_tool, generate_dir, name):
+    """
+    Compile the sample access functions (see SAMPLES), returns the time and peak memory of the compilation, the
+    instructions and size of each sample function, and the amount of instantiated functions without optimization.
+    The sizes are only measured for an Arm target (see targets_arm()), otherwise they are None.
+    """
+    source_file = os.path.join(generate_dir, 'benchmark_samples.cpp')
+    with open(source_file, 'w') as file:
+        file.write(''.join(f'#include "{name}-{group}-regifc.hpp"\n' for group in SAMPLE_GROUPS))
+        file.write(''.join(f'extern "C" {sample}\n' for sample in SAMPLES.values()))
+
+    assembly_file = os.path.join(generate_dir, 'benchmark_samples.s')
+    object_file = os.path.join(generate_dir, 'benchmark_samples.o')
+    command = [compiler, *cxx_flags, '-I', generate_dir, '-ffunction-sections']
+    _, duration, peak_memory = run_compiler(command + ['-S', source_file, '-o', assembly_file])
+    with open(assembly_file) as file:
+        instructions = count_instructions(file.read(), SAMPLES)
+    # Later options take precedence, so this disables the optimization in the flags
+    run_compiler(command + ['-O0', '-S', source_file, '-o', assembly_file])
+    with open(assembly_file) as file:
+        instantiated_functions = count_instantiated_functions(file.read())
+    sizes = {}
+    if targets_arm(compiler, cxx_flags):
+        run_compiler(command + ['-c', source_file, '-o', object_file])
+        sizes = section_sizes(size_tool, object_file)
+
+    functions = {sample: {'instructions': instructions.get(sample), 'size': sizes.get(f'.text.{sample}')} for sample in SAMPLES}
+    return {'time': duration, 'peak_memory': peak_memory, 'instantiated_functions': instantiated_functions, 'functions': functions}
+
+def benchmark_svd(svd_file, compiler=DEFAULT_COMPILER, cxx_flags=DEFAULT_CXX_FLAGS, size_tool=None, ignore_cluster_regex='', repeat=1, header=True, samples=True):
+    """
+    Generate the files of the SVD file into a temporary directory, and benchmark the header and the samples
+    """
+    cxx_flags = shlex.split(cxx_flags)
+    name = device_name(svd_file)
+    results = {}
+    with tempfile.TemporaryDirectory() as generate_dir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            svd2cpp.convert(svd_file, ignore_cluster_regex, generate_dir=generate_dir, split_groups=True)
+        if header:
+            results['header'] = benchmark_header(compiler, cxx_flags, generate_dir, name, repeat)
+        if samples:
+            results['samples'] = benchmark_samples(compiler, cxx_flags, size_tool or default_size_tool(compiler), generate_dir, name)
+    return results
+
+def compiler_version(compiler):
+    """
+    First line of the version of the compiler
+    """
+    return subprocess.run([compiler, '--version'], capture_output=True, text=True, check=True).stdout.splitlines()[0]
+
+def compare_results(results, baseline, tolerance):
+    """
+    Compare the results to the baseline, returns a list of regressions, each a tuple (name, measurement, baseline value,
+    result value). The measurements of the samples are compared exactly, as they do not depend on the machine.
+    """
+    regressions = []
+
+    def compare(name, measurement, baseline_value, value, tolerance, min_difference):
+        if baseline_value is None or value is None:
+            return
+        if value > baseline_value * (1 + tolerance) and value - baseline_value > min_difference:
+            regressions.append((name, measurement, baseline_value, value))
+
+    for svd_file, result in results['devices'].items():
+        baseline_result = baseline.get('devices', {}).get(svd_file, {})
+        if 'header' in result and 'header' in baseline_result:
+            name = f'{svd_file} header'
+            compare(name, 'time', baseline_result['header']['time'], result['header']['time'], tolerance, MIN_TIME_DIFFERENCE)
+            compare(name, 'peak_memory', baseline_result['header']['peak_memory'], result['header']['peak_memory'], tolerance, MIN_MEMORY_DIFFERENCE)
+        if 'samples' in result and 'samples' in baseline_result:
+            samples = result['samples']
+            baseline_samples = baseline_result['samples']
+            compare(f'{svd_file} samples', 'instantiated_functions', baseline_samples['instantiated_functions'], samples['instantiated_functions'], 0, 0)
+            for sample, function in samples['functions'].items():
+                baseline_function = baseline_samples['functions'].get(sample, {})
+                for measurement in ['instructions', 'size']:
+                    compare(f'{svd_file} {sample}', measurement, baseline_function.get(measurement), function[measurement], 0, 0)
+    return regressions
+
+def print_results(results):
+    for svd_file, result in results['devices'].items():
+        if 'header' in result:
+            header = result['header']
+            print()
+            print(f'{svd_file} header: {header['time']:.2f}s, peak memory {header['peak_memory'] / 1024 / 1024:.1f}MB')
+            for entry, report in header['time_report'].items():
+                memory = f'{report['memory'] / 1024 / 1024:>10.1f}MB' if report['memory'] is not None else f'{'-':>12}'
+                print(f'  {entry:<32}  {report['wall']:>8.2f}s  {memory}')
+        if 'samples' in result:
+            samples = result['samples']
+            print()
+            print(f'{svd_file} samples: {samples['time']:.2f}s, peak memory {samples['peak_memory'] / 1024 / 1024:.1f}MB, {samples['instantiated_functions']} instantiated functions')
+            print(f'  {'Sample':<32}  {'Instructions':>12}  {'Size':>8}')
+            for sample, function in samples['functions'].items():
+                size = f'{function['size']:>7}B' if function['size'] is not None else f'{'-':>8}'
+                print(f'  {sample:<32}  {function['instructions'] if function['instructions'] is not None else '-':>12}  {size}')
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='svd_codegen_benchmark', description='Benchmark compiling the code generated for SVD files')
+    parser.add_argument('svd_files', type=str, nargs='*', help='Paths to the SVD files to benchmark, by default the bundled SVD files', default=DEFAULT_SVD_FILES)
+    parser.add_argument('--ignore_cluster', type=str, help='Regex indicating which clusters to ignore, passed to svd_cleanup', default='')
+    parser.add_argument('--compiler', type=str, help='C++ compiler used to compile the generated headers', default=DEFAULT_COMPILER)
+    parser.add_argument('--cxx_flags', type=str, help='Flags passed to the compiler', default=DEFAULT_CXX_FLAGS)
+    parser.add_argument('--size_tool', type=str, help='Tool used to read the size of the compiled samples, by default the size tool belonging to the compiler', default=None)
+    parser.add_argument('--repeat', type=int, help='Amount of header compilations of which the fastest time is used', default=1)
+    parser.add_argument('--no_header', action='store_true', help='Do not compile the device header, which takes long for large devices')
+    parser.add_argument('--no_samples', action='store_true', help='Do not compile the sample access functions, e.g., for SVD files without the sampled peripherals')
+    parser.add_argument('--output', type=str, help='Path of the JSON file to store the results', default='svd_codegen_benchmark.json')
+    parser.add_argument('--compare', type=str, help='Path of a JSON file with baseline results, to report regressions', default=None)
+    parser.add_argument('--tolerance', type=float, help='Relative increase in compile time or memory compared to the baseline which is reported as regression', default=0.1)
+    args = parser.parse_args()
+
+    results = {
+        'format': BENCHMARK_FORMAT,
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'processor': platform.processor(), 'compiler': compiler_version(args.compiler)},
+        'arguments': {'ignore_cluster': args.ignore_cluster, 'compiler': args.compiler, 'cxx_flags': args.cxx_flags},
+        'repeat': args.repeat,
+        'devices': {},
+    }
+    for svd_file in args.svd_files:
+        print(f'Benchmarking {svd_file}...')
+        results['devices'][os.path.basename(svd_file)] = benchmark_svd(svd_file, args.compiler, args.cxx_flags, args.size_tool, args.ignore_cluster, args.repeat, not args.no_header, not args.no_samples)
+    print_results(results)
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=4)
+    print()
+    print(f'Stored results in {args.output}')
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if baseline.get('format') != BENCHMARK_FORMAT:
+            sys.exit(f'Baseline {args.compare} has format {baseline.get('format')}, expected {BENCHMARK_FORMAT}')
+        if baseline.get('arguments') != results['arguments'] or baseline.get('environment', {}).get('compiler') != results['environment']['compiler']:
+            print(f'Warning: baseline {args.compare} was run with different arguments {baseline.get('arguments')} or compiler {baseline.get('environment', {}).get('compiler')}')
+        regressions = compare_results(results, baseline, args.tolerance)
+        print()
+        if regressions:
+            print(f'Found {len(regressions)} regressions compared to {args.compare}:')
+            for name, measurement, baseline_value, value in regressions:
+                if measurement == 'time':
+                    print(f'  {name} {measurement}: {baseline_value:.2f}s -> {value:.2f}s')
+                else:
+                    print(f'  {name} {measurement}: {baseline_value} -> {value}')
+            sys.exit(1)
+        print(f'No regressions compared to {args.compare}')
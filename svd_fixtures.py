@@ -0,0 +1,222 @@
+"""
+Check the conversion of the fixture SVD files in svd/fixtures, which cover features that the bundled SVD files do not
+use. For each fixture (see FIXTURES), the files are generated (with split groups) into a temporary directory, and:
+ * the generated files are checked for the expected contents of the fixture
+ * a source file with the sample access functions of the fixture is compiled to assembly with the host compiler, which
+   instantiates the class templates that the samples use (the inline assembly in the headers is Arm only, so the
+   assembly is not assembled into an object file)
+ * each rejected sample of the fixture, which the access types of its registers or fields do not allow, fails to compile
+ * the write backs of the fixture are run on a register in host memory, checking the stored value (which requires a
+   compiler for the host, and samples that do not use the Arm inline assembly, see --no_run)
+Any failed check is reported, in which case the exit code is 1:
+    uv run svd_fixtures.py
+    uv run svd_fixtures.py --compiler clang++
+    uv run svd_fixtures.py --compiler arm-none-eabi-g++ --no_run
+"""
+import contextlib
+import io
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+
+import svd2cpp
+
+DEFAULT_COMPILER = 'g++'
+DEFAULT_CXX_FLAGS = '-std=c++20 -O2'
+
+
+def check_dedup_groups(generate_dir):
+    """
+    The LPUART group has registers equal to the USART group, apart from the descriptions of the generated clusters, so
+    it uses the USART interface (see svd_cleanup.deduplicate_groups())
+    """
+    errors = []
+    with open(os.path.join(generate_dir, 'fixture_dedup-regifc.h')) as file:
+        declarations = file.read()
+    for alias in ['using LPUARTInterface = USARTInterface;', 'using LPUARTCHInterface = USARTCHInterface;']:
+        if alias not in declarations:
+            errors.append(f'Missing alias "{alias}" in fixture_dedup-regifc.h')
+    with open(os.path.join(generate_dir, 'fixture_dedup-lpuart-regifc.hpp')) as file:
+        if 'struct LPUARTInterface' in file.read():
+            errors.append('The LPUART interface is defined, instead of using the USART interface')
+    return errors
+
+def check_access_types(generate_dir):
+    """
+    The write one to clear fields (of the SR register with other fields to preserve, and of the ICR register without)
+    and the registers with a read action, or that are read-only or write-only, use their restricted classes. The
+    read-only field of the ICR register stays read-only, in spite of the modified write values of the register. The
+    w1c fields are written back as zero by the read-modify-writes of the other fields. The w1c fields of the write-only
+    WICR register are cleared by a single write, and those of the FSR register (with a read action) are cleared by a
+    single write of the given value of the fields to preserve.
+    """
+    errors = []
+    with open(os.path.join(generate_dir, 'fixture_access-acc-regifc.hpp')) as file:
+        interface = file.read()
+    for declaration in ['OneToClearField<SRReg, 1, 1, 0x00000100>', 'OneToClearField<ICRReg, 1, 1, 0x00000000>',
+                        'struct DRReg : public ReadActionRegister<', 'struct ISRReg : public ReadOnlyRegister<',
+                        'struct TDRReg : public WriteOnlyRegister<', 'using ACTIVEField = ReadOnlyField<ICRReg, 0, 1>;',
+                        'struct SRReg : public Register<std::uint32_t, 0x00000000, SRReg, 0x00000006>',
+                        'using IEField = VolatileField<SRReg, 8, 1, 0x00000006>;', 'StableAccessBase<reg_type, 0x00000006>',
+                        'using EOCCField = OneToClearField<WICRReg, 2, 1, 0x00000000>;',
+                        'using OVFField = OneToClearField<FSRReg, 0, 1, 0x00000F00, false>;']:
+        if declaration not in interface:
+            errors.append(f'Missing declaration "{declaration}" in fixture_access-acc-regifc.hpp')
+    return errors
+
+# Fixtures by name: the SVD file, the arguments of svd2cpp.convert(), the function checking the generated files
+# (returning a list of errors), the headers and sample access functions compiled with the host compiler, the
+# (optional) samples that must fail to compile, as the access types of their registers or fields do not allow them, and
+# the (optional) write backs: the register, its value, the statement accessing it as reg, and the expected value after
+FIXTURES = {
+    'dedup_groups': {
+        'svd_file': 'svd/fixtures/dedup_groups.svd',
+        'arguments': {'dedup_groups': True},
+        'check': check_dedup_groups,
+        'headers': ['fixture_dedup-usart-regifc.hpp', 'fixture_dedup-lpuart-regifc.hpp'],
+        'samples': [
+            'void usart_channel(unsigned channel, std::uint8_t prio) { USART1_IFC.CH[channel].CFG.read().EN().set().PRIO(prio).write(); }',
+            'void lpuart_channel(unsigned channel, std::uint8_t prio) { LPUART1_IFC.CH[channel].CFG.read().EN().set().PRIO(prio).write(); }',
+            'std::uint32_t lpuart_data() { return LPUART1_IFC.CH[2].DATA.DATA(); }',
+        ],
+    },
+    'access_types': {
+        'svd_file': 'svd/fixtures/access_types.svd',
+        'arguments': {},
+        'check': check_access_types,
+        'headers': ['fixture_access-acc-regifc.hpp'],
+        'samples': [
+            'void sr_clear_overrun() { ACC1_IFC.SR.OVR().clear(); }',
+            'void icr_clear_end_of_conversion() { ACC1_IFC.ICR.EOCC().clear(); }',
+            'void sr_enable_interrupt() { ACC1_IFC.SR.read().IE().set().write(); }',
+            'bool sr_busy() { return ACC1_IFC.SR.BUSY(); }',
+            'std::uint16_t dr_pop() { return ACC1_IFC.DR.read().DATA(); }',
+            'void dr_write(std::uint16_t data) { ACC1_IFC.DR.write(data); }',
+            'bool icr_active() { return ACC1_IFC.ICR.ACTIVE(); }',
+            'std::uint8_t isr_pending() { return ACC1_IFC.ISR.read().PENDING(); }',
+            'void tdr_write(std::uint16_t data) { ACC1_IFC.TDR.init().TDATA(data).write(); }',
+            'void wicr_clear_end_of_conversion() { ACC1_IFC.WICR.EOCC().clear(); }',
+            'void wicr_clear_all() { ACC1_IFC.WICR.init().OVRC().set().EOCC().set().write(); }',
+            'std::uint32_t fsr_pop_clear_overflow() { std::uint32_t fsr = ACC1_IFC.FSR.read(); ACC1_IFC.FSR.OVF().clear(fsr); return fsr; }',
+        ],
+        'rejected_samples': [
+            'void sr_set_overrun() { ACC1_IFC.SR.OVR().set(); }',
+            'void dr_modify() { ACC1_IFC.DR.DATA().set(); }',
+            'void isr_write() { ACC1_IFC.ISR.write(0); }',
+            'std::uint32_t tdr_read() { return ACC1_IFC.TDR.read(); }',
+            'void icr_clear_active() { ACC1_IFC.ICR.ACTIVE().clear(); }',
+            'void fsr_clear_overflow() { ACC1_IFC.FSR.OVF().clear(); }',
+        ],
+        'write_backs': [
+            ('ACCInterface::SRReg', 0x007, 'reg.read().IE().set().write();', 0x101),
+            ('ACCInterface::SRReg', 0x007, 'reg.IE().set();', 0x101),
+            ('ACCInterface::SRReg', 0x107, 'reg.IE().clr();', 0x001),
+            ('ACCInterface::SRReg', 0x107, 'reg.IE().rmw(0);', 0x001),
+            ('ACCInterface::SRReg', 0x007, 'reg.set(0x100);', 0x101),
+            ('ACCInterface::SRReg', 0x107, 'reg.OVR().clear();', 0x102),
+            ('ACCInterface::ICRReg', 0x007, 'reg.EOCC().clear();', 0x004),
+            ('ACCInterface::WICRReg', 0x000, 'reg.EOCC().clear();', 0x004),
+            ('ACCInterface::FSRReg', 0x000, 'reg.OVF().clear(0x503);', 0x501),
+            ('ACCInterface::FSRReg', 0x501, 'reg.read().THRESH(2).write();', 0x200),
+        ],
+    },
+}
+
+
+def compile_samples(compiler, cxx_flags, generate_dir, fixture):
+    """
+    Compile the sample access functions of the fixture to assembly, returns a list with the compiler output on failure
+    """
+    source_file = os.path.join(generate_dir, 'fixture_samples.cpp')
+    with open(source_file, 'w') as file:
+        file.write(''.join(f'#include "{header}"\n' for header in fixture['headers']))
+        file.write(''.join(f'extern "C" {sample}\n' for sample in fixture['samples']))
+    command = [compiler, *cxx_flags, '-I', generate_dir, '-S', source_file, '-o', os.path.join(generate_dir, 'fixture_samples.s')]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        return [f'Compiling the samples failed:\n{result.stdout}{result.stderr}']
+    return []
+
+def check_rejected_samples(compiler, cxx_flags, generate_dir, fixture):
+    """
+    Check the syntax of each rejected sample of the fixture on its own, returns a list with the samples that compile
+    """
+    errors = []
+    source_file = os.path.join(generate_dir, 'fixture_rejected.cpp')
+    for sample in fixture.get('rejected_samples', []):
+        with open(source_file, 'w') as file:
+            file.write(''.join(f'#include "{header}"\n' for header in fixture['headers']))
+            file.write(f'extern "C" {sample}\n')
+        result = subprocess.run([compiler, *cxx_flags, '-I', generate_dir, '-fsyntax-only', source_file], capture_output=True)
+        if result.returncode == 0:
+            errors.append(f'The rejected sample compiles: {sample}')
+    return errors
+
+def run_write_backs(compiler, cxx_flags, generate_dir, fixture):
+    """
+    Build and run a program with the write backs of the fixture, each accessing a register in host memory, returns a
+    list with the write backs that store an unexpected value
+    """
+    write_backs = fixture.get('write_backs', [])
+    if not write_backs:
+        return []
+    source_file = os.path.join(generate_dir, 'fixture_write_backs.cpp')
+    program_file = os.path.join(generate_dir, 'fixture_write_backs')
+    with open(source_file, 'w') as file:
+        file.write(''.join(f'#include "{header}"\n' for header in fixture['headers']))
+        file.write('#include <cstdio>\n\nint main() {\n')
+        for register, value, statement, expected in write_backs:
+            file.write(f'    {{\n        {register}::reg_type value = {value:#x};\n        auto& reg = *reinterpret_cast<{register}*>(&value);\n')
+            file.write(f'        {statement}\n        std::printf("%llx\\n", static_cast<unsigned long long>(value));\n    }}\n')
+        file.write('}\n')
+    result = subprocess.run([compiler, *cxx_flags, '-I', generate_dir, source_file, '-o', program_file], capture_output=True, text=True)
+    if result.returncode != 0:
+        return [f'Compiling the write backs failed:\n{result.stdout}{result.stderr}']
+    result = subprocess.run([program_file], capture_output=True, text=True)
+    errors = []
+    for (register, value, statement, expected), stored in zip(write_backs, result.stdout.split()):
+        if int(stored, 16) != expected:
+            errors.append(f'{statement} on {register} with value {value:#x} stores {int(stored, 16):#x} instead of {expected:#x}')
+    if result.returncode != 0 or len(result.stdout.split()) != len(write_backs):
+        errors.append(f'Running the write backs failed:\n{result.stdout}{result.stderr}')
+    return errors
+
+def check_fixture(name, compiler=DEFAULT_COMPILER, cxx_flags=DEFAULT_CXX_FLAGS, compile=True, run=True):
+    """
+    Generate the files of the fixture into a temporary directory, and check them, returns the list of errors
+    """
+    fixture = FIXTURES[name]
+    svd_file = os.path.join(os.path.abspath(os.path.dirname(__file__)), fixture['svd_file'])
+    with tempfile.TemporaryDirectory() as generate_dir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            svd2cpp.convert(svd_file, '', generate_dir=generate_dir, split_groups=True, **fixture['arguments'])
+        errors = fixture['check'](generate_dir)
+        if compile:
+            errors += compile_samples(compiler, shlex.split(cxx_flags), generate_dir, fixture)
+            errors += check_rejected_samples(compiler, shlex.split(cxx_flags), generate_dir, fixture)
+            if run:
+                errors += run_write_backs(compiler, shlex.split(cxx_flags), generate_dir, fixture)
+    return errors
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='svd_fixtures', description='Check the conversion of the fixture SVD files')
+    parser.add_argument('fixtures', nargs='*', choices=list(FIXTURES), help='Names of the fixtures to check, by default all fixtures')
+    parser.add_argument('--compiler', default=DEFAULT_COMPILER, help='Compiler used to compile the samples')
+    parser.add_argument('--cxx_flags', default=DEFAULT_CXX_FLAGS, help='Flags passed to the compiler')
+    parser.add_argument('--no_compile', action='store_true', help='Only check the generated files, without compiling the samples')
+    parser.add_argument('--no_run', action='store_true', help='Do not run the write backs, e.g., when the compiler does not target the host')
+    args = parser.parse_args()
+
+    failed = False
+    for name in args.fixtures or FIXTURES:
+        errors = check_fixture(name, args.compiler, args.cxx_flags, not args.no_compile, not args.no_run)
+        print(f'{name:<24} {'failed' if errors else 'passed'}')
+        for error in errors:
+            print(f'  {error}')
+        failed = failed or bool(errors)
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,201 @@
+"""
+Typed device model used by all stages of svd2cpp and the templates, see device_from_dict().
+
+The dictionary of the SVD parsers (see svd_cleanup.parse_svd()) holds every property of the SVD schema for each
+register and field, most of which are None. The classes of this model store these properties in slots instead, and
+the names and access types (repeated throughout the device) are interned, which reduces the memory of the model to a
+fraction of the dictionary.
+The peripherals, enumerated values and other nested properties (e.g., 'write_constraint') remain dictionaries, as these
+are few, and never compared or modified by the stages.
+
+The model can be exported to the dictionary of the parsers with to_dict(), for tools that expect the dictionary.
+"""
+import dataclasses
+import sys
+
+# Properties of which the values are interned, as equal values are repeated throughout the device
+INTERNED_KEYS = ['name', 'access', 'modified_write_values', 'read_action']
+# Properties added by svd_cleanup and svd2cpp, which are only exported (see to_dict()) if set
+OPTIONAL_KEYS = ['set_reset', 'bit_band', 'cluster_plan', 'interface_group', 'shared_header']
+
+
+@dataclasses.dataclass(slots=True)
+class Field:
+    dim: int = None
+    dim_increment: int = None
+    dim_index: list = None
+    dim_name: str = None
+    dim_array_index: dict = None
+    name: str = None
+    description: str = None
+    bit_offset: int = None
+    bit_width: int = None
+    lsb: int = None
+    msb: int = None
+    bit_range: str = None
+    access: str = None
+    modified_write_values: str = None
+    write_constraint: dict = None
+    read_action: str = None
+    enumerated_values: list = None
+    derived_from: str = None
+
+@dataclasses.dataclass(slots=True)
+class Register:
+    size: int = None
+    access: str = None
+    protection: str = None
+    reset_value: int = None
+    reset_mask: int = None
+    dim: int = None
+    dim_increment: int = None
+    dim_index: list = None
+    dim_name: str = None
+    dim_array_index: dict = None
+    name: str = None
+    display_name: str = None
+    description: str = None
+    alternate_group: str = None
+    alternate_register: str = None
+    address_offset: int = None
+    data_type: str = None
+    modified_write_values: str = None
+    write_constraint: dict = None
+    read_action: str = None
+    fields: list[Field] = None
+    derived_from: str = None
+    # Set/reset alias of the register, see svd_cleanup.find_set_reset_registers()
+    set_reset: dict = None
+    # Bit-band region of the register, see svd_cleanup.find_bit_band_registers()
+    bit_band: dict = None
+
+@dataclasses.dataclass(slots=True)
+class Cluster:
+    """
+    Cluster of registers, either of the SVD file or generated by svd_cleanup.cluster_registers()
+    """
+    size: int = None
+    access: str = None
+    protection: str = None
+    reset_value: int = None
+    reset_mask: int = None
+    dim: int = None
+    dim_increment: int = None
+    dim_index: list = None
+    dim_name: str = None
+    dim_array_index: dict = None
+    name: str = None
+    description: str = None
+    alternate_cluster: str = None
+    header_struct_name: str = None
+    address_offset: int = None
+    registers: list = None
+    clusters: list = None
+    derived_from: str = None
+
+@dataclasses.dataclass(slots=True)
+class MetaCluster:
+    """
+    Cluster array of the SVD file, with the cluster and each of its expanded elements, see
+    svd_cleanup.simplify_registers()
+    """
+    meta_cluster: Cluster
+    clusters: list[Cluster]
+
+@dataclasses.dataclass(slots=True)
+class Group:
+    """
+    Peripherals with equal registers, see svd_cleanup.group_peripherals()
+    """
+    name: str
+    description: str = None
+    registers: list = None
+    peripherals: list[dict] = None
+    # Runs found in each list of registers, see svd_cleanup.cluster_registers()
+    cluster_plan: dict = None
+    # Name of the group whose interface is used instead, see svd_cleanup.deduplicate_groups()
+    interface_group: str = None
+    # Header with the interface shared with other devices, see svd2cpp.generate_shared()
+    shared_header: str = None
+
+@dataclasses.dataclass(slots=True)
+class Device:
+    name: str = None
+    version: str = None
+    description: str = None
+    vendor: str = None
+    vendor_id: str = None
+    series: str = None
+    license_text: str = None
+    cpu: dict = None
+    header_system_filename: str = None
+    header_definitions_prefix: str = None
+    address_unit_bits: int = None
+    width: int = None
+    size: int = None
+    access: str = None
+    protection: str = None
+    reset_value: int = None
+    reset_mask: int = None
+    peripherals: list[dict] = None
+    vendor_extensions: object = None
+    schema_version: str = None
+    namespace_xs: str = None
+    xs_no_namespace_schema_location: str = None
+
+# Classes of all items of the model
+ITEM_TYPES = (Field, Register, Cluster, MetaCluster, Group, Device)
+
+
+def item_from_dict(item_type, item, **values):
+    """
+    Create an item of the type from the dictionary of the parsers, with the given values replacing those of the
+    dictionary. Properties missing in the dictionary are None.
+    """
+    result = item_type(*map(item.get, item_type.__slots__))
+    for name, value in values.items():
+        setattr(result, name, value)
+    for name in INTERNED_KEYS:
+        value = getattr(result, name, None)
+        if isinstance(value, str):
+            setattr(result, name, sys.intern(value))
+    return result
+
+def registers_from_dict(registers):
+    """
+    Convert the list of registers and clusters of a peripheral or cluster, which is None for a peripheral without
+    registers
+    """
+    if registers is None:
+        return None
+    return [register_from_dict(register) for register in registers]
+
+def register_from_dict(register):
+    if 'fields' in register:
+        return item_from_dict(Register, register, fields=[item_from_dict(Field, field) for field in register['fields']])
+    if 'meta_cluster' in register:
+        return MetaCluster(register_from_dict(register['meta_cluster']), [register_from_dict(cluster) for cluster in register['clusters']])
+    if 'registers' in register and 'meta_register' not in register:
+        return item_from_dict(Cluster, register, registers=registers_from_dict(register['registers']), clusters=registers_from_dict(register.get('clusters')))
+    raise ValueError(f'Unsupported register with properties {sorted(register)}')
+
+def device_from_dict(device):
+    """
+    Convert the device dictionary of the parsers (see svd_cleanup.parse_svd()) into the device model, where the
+    registers of each peripheral are converted as well
+    """
+    peripherals = [peripheral | {'registers': registers_from_dict(peripheral['registers'])} for peripheral in device['peripherals']]
+    return item_from_dict(Device, device, peripherals=peripherals)
+
+def to_dict(value):
+    """
+    Export (part of) the model to the dictionary of the parsers, including the properties added by the stages (see
+    OPTIONAL_KEYS) that are set
+    """
+    if isinstance(value, ITEM_TYPES):
+        return {name: to_dict(getattr(value, name)) for name in value.__slots__ if name not in OPTIONAL_KEYS or getattr(value, name) is not None}
+    if isinstance(value, list):
+        return [to_dict(item) for item in value]
+    if isinstance(value, dict):
+        return {key: to_dict(item) for key, item in value.items()}
+    return value
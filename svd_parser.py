@@ -0,0 +1,609 @@
+"""
+Streaming SVD parser, which results in the same dictionary as cmsis_svd (SVDParser.get_device().to_dict()).
+
+The SVD file is read incrementally, and every XML element is converted into a compact record (a dictionary with the
+text of its child elements) and cleared as soon as it has been read.
+The records are then processed in the same steps as cmsis_svd:
+ - Elements with a 'derivedFrom' attribute copy the missing child elements from the element they are derived from
+ - The register properties (size, access, etc.) of the device and peripherals are propagated to their children
+ - Each record is converted into the dictionary of its cmsis_svd model class, expanding 'dim' arrays and applying the
+   cluster and peripheral register naming
+"""
+import copy
+import re
+import xml.etree.ElementTree as ElementTree
+
+# Elements that contain other elements, all other elements are stored as text
+CONTAINER_TAGS = {
+    'device', 'cpu', 'sauRegionsConfig', 'region', 'peripherals', 'peripheral', 'addressBlock', 'interrupt',
+    'registers', 'cluster', 'register', 'fields', 'field', 'enumeratedValues', 'enumeratedValue', 'writeConstraint',
+    'range', 'dimArrayIndex', 'vendorExtensions',
+}
+# Elements that may occur multiple times in their parent element, these are stored as a list
+REPEATED_TAGS = {'peripheral', 'addressBlock', 'interrupt', 'cluster', 'register', 'field', 'enumeratedValues', 'enumeratedValue', 'region'}
+# Register properties that are propagated from the device to the peripherals, registers and clusters
+REGISTER_PROPERTIES = ['size', 'access', 'protection', 'resetValue', 'resetMask']
+
+# Valid values of the enumerated types of the SVD schema
+ACCESS_TYPES = ['read-only', 'write-only', 'read-write', 'writeOnce', 'read-writeOnce']
+PROTECTION_TYPES = ['s', 'n', 'p']
+SAU_ACCESS_TYPES = ['n', 'c']
+ADDRESS_BLOCK_USAGE_TYPES = ['registers', 'buffer', 'reserved']
+DATA_TYPES = [f'{sign}int{bits}_t{pointer}' for pointer in ['', ' *'] for sign in ['u', ''] for bits in [8, 16, 32, 64]]
+ENDIAN_TYPES = ['little', 'big', 'selectable', 'other']
+ENUM_USAGE_TYPES = ['read', 'write', 'read-write']
+MODIFIED_WRITE_VALUES_TYPES = ['oneToClear', 'oneToSet', 'oneToToggle', 'zeroToClear', 'zeroToSet', 'zeroToToggle', 'clear', 'set', 'modify']
+READ_ACTION_TYPES = ['clear', 'set', 'modify', 'modifyExternal']
+
+
+def parse_svd(svd_file : str) -> dict:
+    """
+    Parse the SVD file into the same dictionary as cmsis_svd
+    """
+    root, namespaces = read_records(svd_file)
+    preprocess_records(root)
+    return device_dict(root, namespaces)
+
+def read_records(svd_file):
+    """
+    Incrementally read the SVD file into records.
+    Each record is a dictionary with, for each child element, its text (or record for container elements).
+    Child elements that may be repeated are stored as a list, of all other elements only the first is used.
+    Attributes are stored with an '@' prefix, and the position of the element in the document is stored as '#'.
+    Returns the record of the device and the namespaces declared on the device element
+    """
+    namespaces = {}
+    stack = []
+    position = 0
+    for event, element in ElementTree.iterparse(svd_file, events=('start-ns', 'start', 'end')):
+        if event == 'start-ns':
+            if not stack:
+                namespaces.setdefault(*element)
+        elif event == 'start':
+            if element.tag in CONTAINER_TAGS:
+                record = {'@' + key: value for key, value in element.attrib.items()}
+                record['#'] = position
+                position += 1
+            else:
+                record = None
+            stack.append(record)
+        else:
+            record = stack.pop()
+            value = element.text if record is None else record
+            # The element is fully converted, drop its contents
+            element.clear()
+            if not stack:
+                return record, namespaces
+            parent = stack[-1]
+            if parent is None or element.tag == 'vendorExtensions':
+                continue
+            if element.tag in REPEATED_TAGS:
+                parent.setdefault(element.tag, []).append(value)
+            elif element.tag not in parent:
+                parent[element.tag] = value
+    raise ValueError(f'No device found in SVD file {svd_file}')
+
+def preprocess_records(root):
+    """
+    Apply the 'derivedFrom' attributes and propagate the register properties, in the same order as cmsis_svd
+    """
+    derive_enumerated_values(root)
+    derive_fields(root)
+    derive_registers_or_clusters(root, 'register')
+    derive_registers_or_clusters(root, 'cluster')
+    derive_peripherals(root)
+    propagate_register_properties(root)
+
+def children(record, *path):
+    """
+    List the child records of a record, following the path of tags (e.g., children(peripheral, 'registers', 'register'))
+    """
+    for tag in path[:-1]:
+        record = record.get(tag)
+        if not isinstance(record, dict):
+            return []
+    records = record.get(path[-1], [])
+    return records if isinstance(records, list) else [records]
+
+def descendants(record, tag):
+    """
+    List all descendant records with the given tag, in document order, with their parent record
+    """
+    found = []
+    pending = [record]
+    while pending:
+        parent = pending.pop()
+        for key, value in parent.items():
+            for child in (value if isinstance(value, list) else [value]):
+                if isinstance(child, dict):
+                    if key == tag:
+                        found.append((child, parent))
+                    pending.append(child)
+    found.sort(key=lambda x: x[0]['#'])
+    return found
+
+def find_named(records, name):
+    """
+    Find the first record of which the 'name' element matches
+    """
+    return next((record for record in records if record.get('name') == name), None)
+
+def derive_tags(src, dst):
+    """
+    Copy all child elements of the source record that are missing in the destination record
+    """
+    for tag in [tag for tag in src if tag[0] not in '@#' and tag not in dst]:
+        dst[tag] = copy.deepcopy(src[tag])
+
+def derive_enumerated_values(root):
+    all_enumerated_values = [record for record, _ in descendants(root, 'enumeratedValues')]
+    for dst in [record for record in all_enumerated_values if '@derivedFrom' in record]:
+        src = find_named(all_enumerated_values, dst['@derivedFrom'])
+        if src is not None:
+            for src_value in children(src, 'enumeratedValue'):
+                derive_tags(src_value, dst)
+
+def derive_fields(root):
+    for dst, parent in descendants(root, 'field'):
+        if '@derivedFrom' not in dst:
+            continue
+        derived_path = dst['@derivedFrom'].split('.')
+        src = None
+        if len(derived_path) == 1:
+            src = find_named(children(parent, 'field'), derived_path[0])
+        elif len(derived_path) == 3:
+            peripheral = find_named([record for record, _ in descendants(root, 'peripheral')], derived_path[0])
+            register = peripheral and find_named([record for record, _ in descendants(peripheral, 'register')], derived_path[1])
+            src = register and find_named([record for record, _ in descendants(register, 'field')], derived_path[2])
+        if src is not None and 'name' in dst and 'description' in dst:
+            derive_tags(src, dst)
+
+def derive_registers_or_clusters(root, tag):
+    for dst, parent in descendants(root, tag):
+        if '@derivedFrom' not in dst:
+            continue
+        derived_path = dst['@derivedFrom'].split('.')
+        src = None
+        if len(derived_path) == 1:
+            src = find_named(children(parent, tag), derived_path[0])
+        elif len(derived_path) == 2:
+            peripheral = find_named([record for record, _ in descendants(root, 'peripheral')], derived_path[0])
+            src = peripheral and find_named([record for record, _ in descendants(peripheral, tag)], derived_path[1])
+        if src is not None and 'name' in dst and 'description' in dst and 'addressOffset' in dst:
+            derive_tags(src, dst)
+
+def derive_peripherals(root):
+    peripherals = [record for record, _ in descendants(root, 'peripheral')]
+    for dst in peripherals:
+        if '@derivedFrom' in dst:
+            src = find_named(peripherals, dst['@derivedFrom'])
+            if src is not None:
+                derive_tags(src, dst)
+
+def propagate_properties(records, properties):
+    for record in records:
+        for key, value in properties.items():
+            if key not in record:
+                record[key] = value
+
+def propagate_register_properties(root):
+    """
+    Propagate the register properties of the device to all peripherals, those of each peripheral to all its registers,
+    clusters and address blocks, and the access of each register to its fields
+    """
+    device_properties = {key: root[key] for key in REGISTER_PROPERTIES if key in root}
+    peripherals = [record for record, _ in descendants(root, 'peripheral')]
+    propagate_properties(peripherals, device_properties)
+
+    for peripheral in peripherals:
+        properties = device_properties | {key: peripheral[key] for key in REGISTER_PROPERTIES if key in peripheral}
+        propagate_properties([record for record, _ in descendants(peripheral, 'register')], properties)
+        propagate_properties([record for record, _ in descendants(peripheral, 'cluster')], properties)
+        propagate_properties(children(peripheral, 'addressBlock'), {key: properties[key] for key in ['protection'] if key in properties})
+
+    for register, _ in descendants(root, 'register'):
+        properties = device_properties | {key: register[key] for key in REGISTER_PROPERTIES if key in register}
+        propagate_properties([record for record, _ in descendants(register, 'field')], {key: properties[key] for key in ['access'] if key in properties})
+
+def get_text(record, tag):
+    value = record.get(tag)
+    return value if not isinstance(value, (dict, list)) else None
+
+def get_int(record, tag):
+    """
+    Parse an integer in the same way as cmsis_svd, where invalid values result in None
+    """
+    text_value = get_text(record, tag)
+    if text_value is None:
+        return None
+    text_value = text_value.strip().lower()
+    try:
+        if text_value.startswith('0x'):
+            return int(text_value[2:], 16)
+        elif text_value.startswith('#'):
+            # Binary value, where 'x' (don't care) bits are replaced by zeros
+            text_value = text_value.replace('x', '0')[1:]
+            return int(text_value, 2) if all(x in '01' for x in text_value) else int(text_value)
+        elif text_value.startswith('true'):
+            return 1
+        elif text_value.startswith('false'):
+            return 0
+        return int(text_value)
+    except ValueError:
+        return None
+
+def parse_bool(text_value):
+    text_bool = text_value.lower().strip()
+    if text_bool == '0' or text_bool == 'false':
+        return False
+    elif text_bool == '1' or text_bool == 'true':
+        return True
+    return None
+
+def get_bool(record, tag):
+    if text_value := get_text(record, tag):
+        return parse_bool(text_value)
+    return None
+
+def get_enum(record, tag, values):
+    """
+    Get the text of an element with an enumerated type, which must be one of the given values if present
+    """
+    if text_value := get_text(record, tag):
+        if text_value not in values:
+            raise ValueError(f'{text_value!r} is not a valid value for {tag}')
+        return text_value
+    return None
+
+def parse_access_type(text_value):
+    access_text = text_value.strip()
+    if access_text in ACCESS_TYPES:
+        return access_text
+    # Fix commonly used invalid access types
+    fixes = {'writeonce': 'writeOnce', 'read-writeonce': 'read-writeOnce', 'write': 'write-only'}
+    if access_text in fixes:
+        return fixes[access_text]
+    print(f'[WARNING] Invalid access type "{access_text}"')
+    return None
+
+def parse_dim_index(text_value):
+    if ',' in text_value:
+        return text_value.split(',')
+    elif '-' in text_value:
+        # Inclusive range of either letters or digits
+        start, stop = text_value.split('-')
+        if start.isalpha() and stop.isalpha():
+            return [chr(value) for value in range(ord(start), ord(stop) + 1)]
+        elif start.isdigit() and stop.isdigit():
+            return [str(value) for value in range(int(start), int(stop) + 1)]
+        return []
+    raise ValueError(f'Unexpected dim_index_text: "{text_value}"')
+
+def enumerated_value_dict(record):
+    return {
+        'name': get_text(record, 'name'),
+        'description': get_text(record, 'description'),
+        'value': get_int(record, 'value'),
+        'is_default': get_bool(record, 'isDefault'),
+    }
+
+def dim_element_group(record):
+    dim = get_int(record, 'dim')
+    if dim_index_text := get_text(record, 'dimIndex'):
+        dim_index = parse_dim_index(dim_index_text)
+    else:
+        dim_index = None
+    # Some files omit the dimIndex
+    if dim is not None and dim_index is None:
+        dim_index = list(range(0, dim))
+
+    dim_array_index = None
+    if isinstance(dim_array_index_record := record.get('dimArrayIndex'), dict):
+        dim_array_index = {
+            'header_enum_name': get_text(dim_array_index_record, 'headerEnumName'),
+            'enumerated_value': [enumerated_value_dict(x) for x in children(dim_array_index_record, 'enumeratedValue')],
+        }
+
+    return {
+        'dim': dim,
+        'dim_increment': get_int(record, 'dimIncrement'),
+        'dim_index': dim_index,
+        'dim_name': get_text(record, 'dimName'),
+        'dim_array_index': dim_array_index,
+    }
+
+def register_properties_group(record):
+    access = get_text(record, 'access')
+    return {
+        'size': get_int(record, 'size'),
+        'access': parse_access_type(access) if access else access,
+        'protection': get_enum(record, 'protection', PROTECTION_TYPES),
+        'reset_value': get_int(record, 'resetValue'),
+        'reset_mask': get_int(record, 'resetMask'),
+    }
+
+def write_constraint_dict(record):
+    if not isinstance(record, dict):
+        return None
+    write_constraint_range = None
+    if isinstance(range_record := record.get('range'), dict):
+        write_constraint_range = {
+            'minimum': get_bool(range_record, 'minimum'),
+            'maximum': get_bool(range_record, 'maximum'),
+        }
+    return {
+        'write_as_read': get_bool(record, 'writeAsRead'),
+        'use_enumerated_values': get_bool(record, 'useEnumeratedValues'),
+        'range': write_constraint_range,
+    }
+
+def expand_array(meta, offset_key, name_keys=('name',)):
+    """
+    Expand the dictionary of an item with 'dim' into a list of dictionaries, one for each index in the array
+    """
+    expansion = []
+    for i in range(meta['dim']):
+        item = copy.deepcopy(meta)
+        item['dim'] = None
+        for key in name_keys:
+            if meta[key] and '%s' in meta[key] and meta['dim_index']:
+                item[key] = meta[key] % meta['dim_index'][i]
+        item[offset_key] = meta[offset_key] + meta['dim_increment'] * i
+        expansion.append(item)
+    return expansion
+
+def field_dict(record):
+    field = dim_element_group(record) | {
+        'name': get_text(record, 'name'),
+        'description': get_text(record, 'description'),
+        'bit_offset': get_int(record, 'bitOffset'),
+        'bit_width': get_int(record, 'bitWidth'),
+        'lsb': get_int(record, 'lsb'),
+        'msb': get_int(record, 'msb'),
+        'bit_range': get_text(record, 'bitRange'),
+        'access': parse_access_type(access) if (access := get_text(record, 'access')) is not None else None,
+        'modified_write_values': get_enum(record, 'modifiedWriteValues', MODIFIED_WRITE_VALUES_TYPES),
+        'write_constraint': write_constraint_dict(record.get('writeConstraint')),
+        'read_action': get_enum(record, 'readAction', READ_ACTION_TYPES),
+        'enumerated_values': [
+            {
+                'name': get_text(x, 'name'),
+                'header_enum_name': get_text(x, 'headerEnumName'),
+                'usage': usage.strip().lower() if (usage := get_text(x, 'usage')) else usage,
+                'enumerated_values': [enumerated_value_dict(y) for y in children(x, 'enumeratedValue')],
+                # Not passed on by cmsis_svd
+                'derived_from': None,
+            } for x in children(record, 'enumeratedValues')
+        ] or None,
+        'derived_from': record.get('@derivedFrom'),
+    }
+    for enumerated_values in field['enumerated_values'] or []:
+        if enumerated_values['usage'] is not None and enumerated_values['usage'] not in ENUM_USAGE_TYPES:
+            raise ValueError(f'{enumerated_values['usage']!r} is not a valid value for usage')
+
+    if field['bit_range'] is not None:
+        match = re.search('\\[([0-9]+):([0-9]+)\\]', field['bit_range'])
+        field['bit_offset'] = int(match.group(2))
+        field['bit_width'] = 1 + (int(match.group(1)) - int(match.group(2)))
+    elif field['msb'] is not None:
+        field['bit_offset'] = field['lsb']
+        field['bit_width'] = 1 + (field['msb'] - field['lsb'])
+
+    if field['dim'] is not None:
+        return {'meta_field': field, 'fields': expand_array(field, 'bit_offset')}
+    return field
+
+def register_dict(record):
+    register = register_properties_group(record) | dim_element_group(record) | {
+        'name': get_text(record, 'name'),
+        'display_name': get_text(record, 'displayName'),
+        'description': get_text(record, 'description'),
+        'alternate_group': get_text(record, 'alternateGroup'),
+        'alternate_register': get_text(record, 'alternateRegister'),
+        'address_offset': get_int(record, 'addressOffset'),
+        'data_type': get_enum(record, 'dataType', DATA_TYPES),
+        'modified_write_values': get_enum(record, 'modifiedWriteValues', MODIFIED_WRITE_VALUES_TYPES),
+        'write_constraint': write_constraint_dict(record.get('writeConstraint')),
+        'read_action': get_enum(record, 'readAction', READ_ACTION_TYPES),
+        'fields': [field_dict(x) for x in children(record, 'fields', 'field')],
+        'derived_from': record.get('@derivedFrom'),
+    }
+    if register['dim'] is not None:
+        return {'meta_register': register, 'registers': expand_array(register, 'address_offset', ('name', 'display_name'))}
+    return register
+
+def relocate_cluster_registers(cluster):
+    """
+    Prefix the registers in a cluster by the cluster name, and make their address offset relative to the peripheral
+    """
+    for register in cluster['registers']:
+        for sub_register in register['registers'] if 'meta_register' in register else [register]:
+            sub_register['name'] = f'{cluster['name']}_{sub_register['name']}'
+            sub_register['address_offset'] = cluster['address_offset'] + sub_register['address_offset']
+
+def cluster_dict(record):
+    cluster = register_properties_group(record) | dim_element_group(record) | {
+        'name': get_text(record, 'name'),
+        'description': get_text(record, 'description'),
+        'alternate_cluster': get_text(record, 'alternateCluster'),
+        'header_struct_name': get_text(record, 'headerStructName'),
+        'address_offset': get_int(record, 'addressOffset'),
+        'registers': [register_dict(x) for x in children(record, 'register')],
+        'clusters': [cluster_dict(x) for x in children(record, 'cluster')],
+        'derived_from': record.get('@derivedFrom'),
+    }
+    if cluster['dim'] is not None:
+        clusters = expand_array(cluster, 'address_offset')
+        for sub_cluster in clusters:
+            relocate_cluster_registers(sub_cluster)
+        return {'meta_cluster': cluster, 'clusters': clusters}
+    relocate_cluster_registers(cluster)
+    return cluster
+
+def cluster_registers(cluster):
+    """
+    List all registers in a (meta) cluster, including those of its sub clusters, in the same way as cmsis_svd
+    """
+    registers = []
+    if 'meta_cluster' in cluster:
+        for sub_cluster in cluster['clusters']:
+            registers.extend(cluster_registers(sub_cluster))
+        return registers
+    for register in cluster['registers']:
+        if 'meta_register' in register:
+            registers.extend(register['registers'])
+        elif 'fields' in register:
+            registers.append(register)
+    for sub_cluster in cluster['clusters']:
+        registers.extend(cluster_registers(sub_cluster))
+    return registers
+
+def peripheral_registers(peripheral):
+    registers = []
+    for register in peripheral['registers'] or []:
+        if 'meta_register' in register:
+            registers.extend(register['registers'])
+        elif 'fields' in register:
+            registers.append(register)
+        else:
+            registers.extend(cluster_registers(register))
+    return registers
+
+def prepend_append_to_name(peripheral):
+    if peripheral['prepend_to_name'] is None and peripheral['append_to_name'] is None:
+        return
+    for register in peripheral_registers(peripheral):
+        if peripheral['prepend_to_name'] is not None:
+            register['name'] = peripheral['prepend_to_name'] + register['name']
+        if peripheral['append_to_name'] is not None:
+            register['name'] += peripheral['append_to_name']
+
+def peripheral_dict(record):
+    registers = [register_dict(x) for x in children(record, 'registers', 'register')]
+    registers += [cluster_dict(x) for x in children(record, 'registers', 'cluster')]
+    peripheral = register_properties_group(record) | dim_element_group(record) | {
+        'name': get_text(record, 'name'),
+        'version': get_text(record, 'version'),
+        'description': get_text(record, 'description'),
+        # Note the typo, equal to cmsis_svd
+        'alternate_peripheral': get_text(record, 'alternaPeripheral'),
+        'group_name': get_text(record, 'groupName'),
+        'prepend_to_name': get_text(record, 'prependToName'),
+        'append_to_name': get_text(record, 'appendToName'),
+        'header_struct_name': get_text(record, 'headerStructName'),
+        'disable_condition': get_text(record, 'disableCondition'),
+        'base_address': get_int(record, 'baseAddress'),
+        'address_blocks': [
+            {
+                'offset': get_int(x, 'offset'),
+                'size': get_int(x, 'size'),
+                'usage': usage if (usage := (get_text(x, 'usage') or '').strip()) in ADDRESS_BLOCK_USAGE_TYPES else None,
+                'protection': get_enum(x, 'protection', PROTECTION_TYPES),
+            } for x in children(record, 'addressBlock')
+        ] or None,
+        'interrupts': [
+            {
+                'name': get_text(x, 'name'),
+                'description': get_text(x, 'description'),
+                'value': get_int(x, 'value'),
+            } for x in children(record, 'interrupt')
+        ] or None,
+        'registers': registers or None,
+        'derived_from': record.get('@derivedFrom'),
+    }
+    prepend_append_to_name(peripheral)
+
+    if peripheral['dim'] is not None:
+        peripherals = expand_array(peripheral, 'base_address')
+        # Each peripheral in the array applies the register naming again, equal to cmsis_svd
+        for sub_peripheral in peripherals:
+            prepend_append_to_name(sub_peripheral)
+        return {'meta_peripheral': peripheral, 'peripherals': peripherals}
+    return peripheral
+
+def cpu_dict(record):
+    if not isinstance(record, dict):
+        return None
+    sau_regions_config = None
+    if isinstance(sau_record := record.get('sauRegionsConfig'), dict):
+        sau_regions_config = {
+            'regions': [
+                {
+                    'base': get_int(x, 'base'),
+                    'limit': get_int(x, 'limit'),
+                    'access': get_enum(x, 'access', SAU_ACCESS_TYPES),
+                    'enabled': parse_bool(x.get('@enabled')),
+                    'name': x.get('@name'),
+                } for x in children(sau_record, 'region')
+            ],
+            'enabled': parse_bool(sau_record.get('@enabled')),
+            'protection_when_disabled': get_enum({'protection': sau_record.get('@protectionWhenDisabled')}, 'protection', PROTECTION_TYPES),
+        }
+    return {
+        'name': get_text(record, 'name'),
+        'revision': get_text(record, 'revision'),
+        'endian': get_enum(record, 'endian', ENDIAN_TYPES),
+        'mpu_present': get_bool(record, 'mpuPresent'),
+        'fpu_present': get_bool(record, 'fpuPresent'),
+        'fpu_dp': get_bool(record, 'fpuDP'),
+        # Not parsed by cmsis_svd
+        'dsp_present': None,
+        'icache_present': get_bool(record, 'icachePresent'),
+        'dcache_present': get_bool(record, 'dcachePresent'),
+        'itcm_present': get_bool(record, 'itcmPresent'),
+        'dtcm_present': get_bool(record, 'dtcmPresent'),
+        'vtor_present': get_bool(record, 'vtorPresent'),
+        'nvic_prio_bits': get_int(record, 'nvicPrioBits'),
+        'vendor_systick_config': get_bool(record, 'vendorSystickConfig'),
+        'device_num_interrupts': get_int(record, 'deviceNumInterrupts'),
+        'sau_num_regions': get_int(record, 'sauNumRegions'),
+        'sau_regions_config': sau_regions_config,
+    }
+
+def device_dict(record, namespaces):
+    namespace_xs = namespaces.get('xs')
+    return register_properties_group(record) | {
+        'vendor': get_text(record, 'vendor'),
+        'vendor_id': get_text(record, 'vendorID'),
+        'name': get_text(record, 'name'),
+        'series': get_text(record, 'series'),
+        'version': get_text(record, 'version'),
+        'description': get_text(record, 'description'),
+        'license_text': get_text(record, 'licenseText'),
+        'cpu': cpu_dict(record.get('cpu')),
+        'header_system_filename': get_text(record, 'headerSystemFilename'),
+        'header_definitions_prefix': get_text(record, 'headerDefinitionsPrefix'),
+        'address_unit_bits': get_int(record, 'addressUnitBits'),
+        'width': get_int(record, 'width'),
+        'peripherals': [peripheral_dict(x) for x in children(record, 'peripherals', 'peripheral')],
+        # Not parsed by cmsis_svd
+        'vendor_extensions': None,
+        'schema_version': record.get('@schemaVersion'),
+        'namespace_xs': namespace_xs,
+        'xs_no_namespace_schema_location': record.get(f'@{{{namespace_xs}}}noNamespaceSchemaLocation') if namespace_xs else None,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(prog='svd_parser', description='Compare the streaming SVD parser with cmsis_svd')
+    parser.add_argument('svd_files', type=str, nargs='+', help='Paths to the SVD files to compare')
+    args = parser.parse_args()
+
+    from cmsis_svd import SVDParser
+    all_equal = True
+    for svd_file in args.svd_files:
+        start = time.perf_counter()
+        expected = SVDParser.for_xml_file(svd_file).get_device().to_dict()
+        cmsis_time = time.perf_counter() - start
+        start = time.perf_counter()
+        result = parse_svd(svd_file)
+        stream_time = time.perf_counter() - start
+        equal = expected == result
+        all_equal = all_equal and equal
+        print(f'{svd_file}: {"equal" if equal else "DIFFERENT"} (cmsis_svd {cmsis_time:.2f}s, streaming {stream_time:.2f}s)')
+
+    sys.exit(0 if all_equal else 1)
@@ -0,0 +1,224 @@
+"""
+Watch mode of svd2cpp, which keeps the device model in memory and regenerates the files whenever the SVD file, the
+templates or the ignore cluster file change, see watch().
+
+Each regeneration only repeats the work affected by the change:
+ - Templates: the files are rendered again from the device model in memory
+ - Ignore cluster regex: all groups are clustered again, starting from their cleaned registers
+ - SVD file: only the peripherals of which the XML changed are parsed again (see parse_changed()), and only the groups
+   of which the parsed registers or description differ from the previous model are cleaned and clustered again
+Every other group reuses its clustered registers, so the result is equal to a full conversion.
+"""
+import copy
+import io
+import os
+import pickle
+import re
+import time
+import svd2cpp
+import svd_cleanup
+import svd_model
+
+# Seconds between checks of the watched files
+WATCH_INTERVAL = 0.5
+
+# Peripheral elements in the SVD file, which are never nested
+_peripheral_element = re.compile(rb'<peripheral\b.*?</peripheral>', re.DOTALL)
+_derived_from = re.compile(rb'derivedFrom\s*=\s*"([^"]*)"')
+_element_name = re.compile(rb'<name>\s*([^<]*?)\s*</name>')
+
+
+def copy_model(value):
+    """
+    Deep copy (part of) the device model, which only contains plain values, lists, dictionaries and the classes of
+    svd_model. Pickling is several times faster than copy.deepcopy() for these values.
+    """
+    return pickle.loads(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+def split_svd(contents):
+    """
+    Split the contents of the SVD file into the XML of each peripheral, and the XML around the peripherals.
+    Returns both lists, where the XML around the peripherals also contains the whitespace between them
+    """
+    peripherals = []
+    surrounding = []
+    end = 0
+    for match in _peripheral_element.finditer(contents):
+        surrounding.append(contents[end:match.start()])
+        peripherals.append(match.group())
+        end = match.end()
+    surrounding.append(contents[end:])
+    return peripherals, surrounding
+
+def related_peripherals(peripherals, indices):
+    """
+    Extend the indices of peripherals with all peripherals related to them by a 'derivedFrom' attribute, in either
+    direction, such that parsing only these peripherals results in the same elements as parsing the whole file.
+    A peripheral refers to another one if any part of the path in one of its 'derivedFrom' attributes is the name of
+    any element in the other peripheral, which may include unrelated peripherals but never misses a related one.
+    Returns the sorted indices
+    """
+    names = [set(_element_name.findall(peripheral)) for peripheral in peripherals]
+    references = [{part for path in _derived_from.findall(peripheral) for part in path.split(b'.')} for peripheral in peripherals]
+    related = set(indices)
+    pending = list(indices)
+    while pending:
+        idx = pending.pop()
+        for other in range(len(peripherals)):
+            if other not in related and (references[idx] & names[other] or references[other] & names[idx]):
+                related.add(other)
+                pending.append(other)
+    return sorted(related)
+
+def parse_changed(state, contents, svd_file, svd_parser):
+    """
+    Parse the SVD file contents into the device dictionary, reusing the parsed peripherals of the previous contents in
+    the watch state when possible.
+    If only the XML of some peripherals changed, only these (and related, see related_peripherals()) peripherals are
+    parsed with the streaming parser, in a document with the same elements around the peripherals. Otherwise, or if
+    these do not result in one parsed peripheral each, the whole file is parsed with the selected parser (see
+    svd_cleanup.parse_svd()).
+    Returns the device dictionary and the amount of parsed peripherals
+    """
+    peripherals, surrounding = split_svd(contents)
+    previous = state.get('svd')
+    if previous is not None and previous['surrounding'] == surrounding and len(previous['peripherals']) == len(peripherals):
+        changed = [idx for idx, peripheral in enumerate(peripherals) if peripheral != previous['peripherals'][idx]]
+        parsed = related_peripherals(peripherals, changed) if changed else []
+        device = copy.copy(previous['device'])
+        device.peripherals = list(device.peripherals)
+        try:
+            parsed_peripherals = []
+            if parsed:
+                document = surrounding[0] + b''.join(peripherals[idx] for idx in parsed) + surrounding[-1]
+                parsed_peripherals = svd_cleanup.parse_svd(io.BytesIO(document), 'stream').peripherals
+        except SyntaxError:
+            # Parse the whole file instead, which reports the error at its location in the file
+            pass
+        else:
+            # Each parsed peripheral replaces the previous one of its XML, if the amount differs they no longer map
+            # to each other, so the whole file is parsed instead
+            if len(parsed_peripherals) == len(parsed):
+                for idx, peripheral in zip(parsed, parsed_peripherals):
+                    device.peripherals[idx] = peripheral
+                state['svd'] = {'peripherals': peripherals, 'surrounding': surrounding, 'device': device}
+                return device, len(parsed)
+
+    device = svd_cleanup.parse_svd(svd_file, svd_parser)
+    if len(device.peripherals) != len(peripherals):
+        # Unable to map the parsed peripherals to their XML, always parse the whole file
+        surrounding = None
+    state['svd'] = {'peripherals': peripherals, 'surrounding': surrounding, 'device': device}
+    return device, len(device.peripherals)
+
+def process_groups(state, device, ignore_cluster_regex, cluster_engine='search', jobs=1):
+    """
+    Group the peripherals of the parsed device, and clean and cluster the registers of the groups that changed since
+    the previous model in the watch state. If the ignore cluster regex changed, all groups are clustered again from
+    their cleaned registers.
+    The parsed device is not modified, the device and groups are returned as copies that can be completed and
+    generated (see svd2cpp.finish_model()), along with the amount of processed groups.
+    """
+    # Grouping removes the registers and description from the peripherals, which are kept in the parsed device
+    device = copy.copy(device)
+    device.peripherals = [dict(peripheral) for peripheral in device.peripherals]
+    groups = svd_cleanup.group_peripherals(device)
+
+    previous = state.get('groups', {})
+    recluster = state.get('ignore_cluster') != ignore_cluster_regex
+    processed = {}
+    changed = {}
+    for name, group in groups.items():
+        previous_group = previous.get(name)
+        # Equal parsed registers are usually the same objects, for which the comparison is immediate
+        if previous_group is not None and previous_group['parsed'] == (group.description, group.registers):
+            processed[name] = previous_group
+        else:
+            changed[name] = svd_model.Group(name, group.description, copy_model(group.registers))
+            processed[name] = {'parsed': (group.description, group.registers)}
+
+    if changed:
+        svd_cleanup.simplify_registers(changed, jobs)
+        svd_cleanup.clean_registers(changed, jobs)
+        for name, group in changed.items():
+            processed[name]['cleaned'] = copy_model({'description': group.description, 'registers': group.registers})
+    clustered = changed if not recluster else {name: svd_model.Group(name, **copy_model(group['cleaned'])) for name, group in processed.items()}
+    if clustered:
+        svd_cleanup.cluster_registers(clustered, ignore_cluster_regex, cluster_engine, jobs)
+        for name, group in clustered.items():
+            processed[name]['clustered'] = {'description': group.description, 'registers': group.registers}
+
+    # The model is only updated once all groups are processed, such that a failure keeps the previous model
+    state['groups'] = processed
+    state['ignore_cluster'] = ignore_cluster_regex
+    for name, group in groups.items():
+        clustered_group = copy_model(processed[name]['clustered'])
+        group.description, group.registers = clustered_group['description'], clustered_group['registers']
+    return device, groups, len(clustered)
+
+def watched_files(svd_file, ignore_cluster_file=None):
+    """
+    Modification time and size of all watched files, by path: the SVD file, the templates and the ignore cluster file
+    """
+    paths = [svd_file] + [os.path.join(svd2cpp.template_dir(), name) for name in sorted(os.listdir(svd2cpp.template_dir()))]
+    if ignore_cluster_file:
+        paths.append(ignore_cluster_file)
+    files = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            files[path] = None
+    return files
+
+def regenerate(state, svd_file, ignore_cluster_regex, generate_dir, env, svd_parser='cmsis_svd', cluster_engine='search', jobs=1, split_groups=False, dedup_groups=False, set_reset=svd2cpp.DEFAULT_SET_RESET, bit_band='', templates_only=False):
+    """
+    Regenerate the files from the device model in the watch state, after updating the model with the changes to the SVD
+    file and ignore cluster regex (see parse_changed() and process_groups()), or only render the templates again.
+    """
+    start = time.perf_counter()
+    if templates_only and 'model' in state:
+        summary = 'templates changed'
+    else:
+        with open(svd_file, 'rb') as file:
+            contents = file.read()
+        device, parsed_count = parse_changed(state, contents, svd_file, svd_parser)
+        device, groups, processed_count = process_groups(state, device, ignore_cluster_regex, cluster_engine, jobs)
+        state['model'] = svd2cpp.finish_model(device, groups, ignore_cluster_regex, dedup_groups, set_reset, bit_band)
+        summary = f'parsed {parsed_count} of {len(device.peripherals)} peripherals, clustered {processed_count} of {len(groups)} groups'
+
+    inputs = svd2cpp.generate_inputs(svd_file, {'ignore_cluster': ignore_cluster_regex, 'split_groups': split_groups, 'dedup_groups': dedup_groups, 'set_reset': set_reset, 'bit_band': bit_band})
+    svd2cpp.update_generated(*state['model'], generate_dir, env, split_groups, inputs, jobs)
+    print(f'Regenerated {generate_dir} in {time.perf_counter() - start:.2f}s ({summary})')
+
+def watch(svd_file, ignore_cluster_regex, generate_dir, ignore_cluster_file=None, cache_dir=None, interval=WATCH_INTERVAL, **options):
+    """
+    Convert the SVD file, then keep checking the watched files (see watched_files()) every interval seconds, and
+    regenerate the files whenever any of them changes (see regenerate()), until interrupted.
+    With an ignore cluster file, the ignore cluster regex is read from this file (see svd2cpp.read_ignore_cluster_file()).
+    A failed regeneration (e.g., an SVD file that is being edited) is reported, and the previous model is kept.
+    The options are passed to regenerate().
+    """
+    if generate_dir is None:
+        generate_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'generated')
+    env = svd2cpp.create_environment(os.path.join(cache_dir, 'templates') if cache_dir else None)
+    state = {}
+    files = None
+    try:
+        while True:
+            current_files = watched_files(svd_file, ignore_cluster_file)
+            if current_files != files:
+                # Only render the files again if neither the SVD file nor the ignore cluster file changed
+                templates_only = files is not None and all(current_files.get(path) == files.get(path) for path in [svd_file, ignore_cluster_file])
+                files = current_files
+                try:
+                    if ignore_cluster_file:
+                        ignore_cluster_regex = svd2cpp.read_ignore_cluster_file(ignore_cluster_file)
+                    regenerate(state, svd_file, ignore_cluster_regex, generate_dir, env, templates_only=templates_only, **options)
+                except Exception as e:
+                    print(f'Failed to regenerate {generate_dir}: {type(e).__name__}: {e}')
+                print(f'Watching {svd_file} and the templates for changes, press Ctrl+C to stop')
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print(f'Stopped watching {svd_file}')